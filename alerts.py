@@ -0,0 +1,128 @@
+"""Price-change alert scanner: every product, every month, in one vectorized pass.
+
+Three signals per (Product_Key, Bulan), computed on the monthly mean price:
+
+* ``Z_Tren`` — residual against the product's own trend line (``product_stats``;
+  in change-point mode the segment the month falls in), studentized leave-one-out.
+* ``Z_Kohort`` — the month-over-month log change against the other products of the
+  same Generasi/Variant cohort in that month (leave-one-out z, ≥ 3 products).
+* ``MoM (%)`` — percent change from the product's previous observed month.
+
+A row is an alert when any signal crosses its threshold; ``Skor`` is the largest
+signal relative to its threshold, so the table ranks mixed signals together.
+
+    python3 alerts.py --out alerts.csv [--z-tren 2.5] [--z-kohort 2.5] [--mom 10] [--bulan 2026-02]
+"""
+
+import numpy as np
+import pandas as pd
+
+# "Tren" label band (Rp/bulan), shared by the Tren/Versus tables and the prediction panel
+TREND_THRESHOLD = 50_000
+ALERT_Z_TREN = 2.5
+ALERT_Z_KOHORT = 2.5
+ALERT_MOM_PCT = 10.0
+# Scale floors keep near-perfect fits and identical peers from producing huge z-scores
+RESID_FLOOR = 0.01
+COHORT_FLOOR = 0.01
+
+ALERT_COLUMNS = [
+    "Bulan", "Kondisi", "Generasi", "Variant", "Storage", "Harga", "Harga_Tren",
+    "Z_Tren", "Z_Kohort", "MoM (%)", "Arah", "Sinyal", "Skor", "Product_Key",
+]
+
+
+def trend_label(delta, threshold=TREND_THRESHOLD):
+    """"📉 Turun" / "📈 Naik" / "➡️ Stabil" for a price change (scalar or array) against ±``threshold`` Rp."""
+    delta = np.asarray(delta, dtype=float)
+    label = np.where(delta < -threshold, "📉 Turun", np.where(delta > threshold, "📈 Naik", "➡️ Stabil"))
+    return label.item() if label.ndim == 0 else label
+
+
+def scan_alerts(df, product_stats, z_tren=ALERT_Z_TREN, z_kohort=ALERT_Z_KOHORT, mom_pct=ALERT_MOM_PCT,
+                all_rows=False):
+    """Ranked alert table (see module docstring); ``all_rows`` keeps unflagged rows too (Skor < 1)."""
+    panel = (df.groupby(["Product_Key", "Bulan"], sort=True)
+             .agg(Kondisi=("Kondisi", "first"), Generasi=("Generasi", "first"),
+                  Variant=("Variant_Normalized", "first"), Storage=("Storage", "first"),
+                  Bulan_Index=("Bulan_Index", "first"), Harga=("Harga", "mean"))
+             .reset_index())
+    price = panel["Harga"].to_numpy(dtype=float)
+
+    # Residual vs the product's trend line, studentized leaving the point itself out
+    # (an in-sample z over 4–6 points can never get far past 1)
+    st_ = product_stats.reindex(panel["Product_Key"])
+    dof = st_["dof"].to_numpy()
+    t = panel["Bulan_Index"].to_numpy(dtype=float)
+    # Months before a change point are measured against the segment before it
+    before = t < st_["break_t"].to_numpy()
+
+    def seg(col):
+        return np.where(before, st_[f"pre_{col}"].to_numpy(), st_[col].to_numpy())
+
+    fitted = seg("intercept") + seg("slope") * t
+    resid = price - fitted
+    with np.errstate(divide="ignore", invalid="ignore"):
+        h = 1 / np.where(before, st_["pre_n"].to_numpy(), st_["n_line"].to_numpy()) + (t - seg("t_bar")) ** 2 / seg("sxx")
+        rss = st_["resid_var"].to_numpy() * dof
+        var_loo = (rss - resid ** 2 / (1 - h)) / (dof - 1)
+        scale = np.fmax(np.sqrt(np.clip(var_loo, 0, None)), RESID_FLOOR * np.abs(fitted)) * np.sqrt(1 - h)
+        z_resid = np.where((dof > 1) & (h < 1), resid / scale, np.nan)
+
+    # Month over month: previous row of the same product (the panel is sorted by key, month)
+    same = panel["Product_Key"].eq(panel["Product_Key"].shift())
+    prev = np.where(same, np.roll(price, 1), np.nan)
+    mom = (price / prev - 1) * 100
+    log_change = np.log(price / prev)
+
+    # Leave-one-out z of the log change within Generasi/Variant/Bulan
+    cohort = pd.Series(log_change).groupby(
+        [panel["Generasi"], panel["Variant"], panel["Bulan"]], sort=False)
+    n = cohort.transform("count").to_numpy(dtype=float)
+    s1 = cohort.transform("sum").to_numpy()
+    s2 = pd.Series(log_change ** 2).groupby(
+        [panel["Generasi"], panel["Variant"], panel["Bulan"]], sort=False).transform("sum").to_numpy()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean_o = (s1 - log_change) / (n - 1)
+        var_o = (s2 - log_change ** 2 - (n - 1) * mean_o ** 2) / (n - 2)
+        z_cohort = (log_change - mean_o) / np.fmax(np.sqrt(np.clip(var_o, 0, None)), COHORT_FLOOR)
+    z_cohort = np.where(n >= 3, z_cohort, np.nan)
+
+    ratios = np.column_stack([np.abs(z_resid) / z_tren, np.abs(z_cohort) / z_kohort, np.abs(mom) / mom_pct])
+    hit = ratios >= 1
+    signal = pd.Series((hit * np.array(["tren,", "kohort,", "mom,"], dtype=object)).sum(axis=1)).str.rstrip(",")
+    score = np.where(np.isnan(ratios), -np.inf, ratios).max(axis=1)
+    # Direction follows the month-over-month move when it fired, else the trend residual, else the cohort
+    direction = np.where(hit[:, 2], mom, np.where(hit[:, 0], z_resid, z_cohort))
+
+    out = panel.assign(
+        Harga_Tren=fitted, Z_Tren=z_resid, Z_Kohort=z_cohort, **{"MoM (%)": mom},
+        Arah=np.where(direction < 0, "📉 Turun", np.where(direction > 0, "📈 Naik", "➡️ Stabil")),
+        Sinyal=signal.to_numpy(), Skor=np.where(np.isfinite(score), score, np.nan),
+    )[ALERT_COLUMNS]
+    if not all_rows:
+        out = out[hit.any(axis=1)]
+    return out.sort_values(["Skor", "Bulan"], ascending=False, kind="stable").reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from data_loader import load_data
+    from models import build_product_stats, TREND_MODES
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--out", default="alerts.csv", help="file CSV tujuan")
+    parser.add_argument("--z-tren", type=float, default=ALERT_Z_TREN)
+    parser.add_argument("--z-kohort", type=float, default=ALERT_Z_KOHORT)
+    parser.add_argument("--mom", type=float, default=ALERT_MOM_PCT, help="ambang perubahan bulanan (%%)")
+    parser.add_argument("--bulan", help="hanya bulan ini (YYYY-MM); default semua bulan")
+    parser.add_argument("--trend-mode", default="ols", choices=list(TREND_MODES))
+    args = parser.parse_args()
+
+    df = load_data()
+    alerts = scan_alerts(df, build_product_stats(df, args.trend_mode), args.z_tren, args.z_kohort, args.mom)
+    if args.bulan:
+        alerts = alerts[alerts["Bulan"] == pd.Timestamp(args.bulan)]
+    alerts.to_csv(args.out, index=False)
+    print(f"{len(alerts)} alert dari {df['Product_Key'].nunique()} produk → {args.out}")
@@ -1,14 +1,27 @@
 """📱 Prediksi Harga iPhone — Main App Entry Point."""
 
+import time
+
+run_start = time.perf_counter()
+
 import streamlit as st
 import pandas as pd
 import numpy as np
 import plotly.graph_objects as go
 import warnings
 
-from data_loader import load_data
-from models import build_product_models, train_global_models, evaluate_per_product
-from tabs import tab_evaluasi, tab_tren, tab_heatmap, tab_versus, tab_analisis, tab_data
+from data_loader import load_data, load_quarantine
+from models import (
+    build_product_models, start_global_training, evaluate_per_product,
+    build_hierarchical_model, predict_hierarchical, benchmark_hierarchical,
+    build_product_stats, predict_batch, build_price_ladder, predict_ladder,
+    search_global_models, evaluate_trend_modes, TREND_MODES,
+)
+from forecast_grid import get_forecast_grid, refresh_forecast_grid, models_fingerprint, month_ordinal
+from tabs import (
+    tab_evaluasi, tab_tren, tab_heatmap, tab_versus, tab_simulasi, tab_alerts, tab_analisis, tab_data,
+)
+from alerts import TREND_THRESHOLD
 
 warnings.filterwarnings("ignore")
 
@@ -19,12 +32,56 @@ st.caption("Prediksi harga per produk spesifik (Kondisi + Generasi + Variant + S
 
 # ── Load Data & Build Models ─────────────────────────────────────────────────
 df = load_data()
+quarantine = load_quarantine()
+if not quarantine.empty:
+    st.warning(f"🚧 {len(quarantine)} baris data dikarantina saat load — lihat tab Data Lengkap")
 min_date = df["Bulan"].min()
 max_bulan_index = df["Bulan_Index"].max()
 
+# Global models train on a background thread; only the global fallback, the
+# evaluation tab and the footer wait for them.
+global_job = start_global_training(df)
 product_models = build_product_models(df)
-global_results, best_global_model, global_features = train_global_models(df)
 eval_df = evaluate_per_product(df)
+hier_model = build_hierarchical_model(df)
+
+st.sidebar.header("⚙️ Model")
+trend_mode = st.sidebar.selectbox(
+    "Mode Trend Per-Produk", list(TREND_MODES), format_func=TREND_MODES.get,
+)
+product_stats = build_product_stats(df, trend_mode)
+price_ladder = build_price_ladder(df, product_stats, hier_model, trend_mode)
+search_mode = st.sidebar.checkbox("Tuning hyperparameter (Hyperband)", value=False)
+search_result = None
+if search_mode:
+    search_budget = st.sidebar.slider("Budget waktu (detik)", 5, 120, 20)
+    search_tol = st.sidebar.slider("Toleransi MAPE (%)", 0, 20, 5) / 100
+    search_result = search_global_models(df, float(search_budget), search_tol)
+
+
+def global_models():
+    """Block on the background training; returns results, best name, compact model/report and the fallback."""
+    bundle = global_job.result()
+    results, best = bundle["results"], bundle["best"]
+    compact, report = bundle["compact"], bundle["report"]
+    if search_result is not None:
+        tuned = f"{search_result['chosen']['Model']} (Tuned)"
+        results = {**results, tuned: search_result["result"]}
+        best = min(results, key=lambda k: results[k]["mape"])
+        if best == tuned:
+            compact, report = search_result["compact"], search_result["report"]
+    fallback = dict(results[best])
+    if report["parity_ok"]:
+        fallback["model"] = compact
+    return results, best, compact, report, fallback
+
+
+if st.sidebar.button("🔄 Refresh forecast grid"):
+    refresh_forecast_grid()
+# Grid products always have a hierarchy node, so the grid does not need the global model
+forecast_grid = get_forecast_grid(
+    df, product_stats, hier_model, None, models_fingerprint(df, trend_mode), _ladder=price_ladder,
+)
 
 # ── Sidebar: Filter untuk Prediksi ──────────────────────────────────────────
 st.sidebar.header("🔍 Filter Prediksi Harga")
@@ -60,6 +117,8 @@ st.sidebar.markdown("---")
 st.sidebar.subheader("📅 Bulan Prediksi")
 bulan_pred = st.sidebar.slider("Bulan", 1, 12, 3)
 tahun_pred = st.sidebar.number_input("Tahun", min_value=2025, max_value=2030, value=2026)
+interval_level = st.sidebar.select_slider("Interval Prediksi", options=[0.8, 0.9, 0.95], value=0.9,
+                                          format_func=lambda x: f"{x:.0%}")
 
 # ── Prediksi Per-Produk ─────────────────────────────────────────────────────
 pred_date = pd.Timestamp(year=tahun_pred, month=bulan_pred, day=1)
@@ -68,33 +127,43 @@ bulan_index = int(round((pred_date - min_date).days / 30))
 product_key = f"{kondisi}|{generasi}|{variant}|{storage}"
 product_history = df[df["Product_Key"] == product_key].sort_values("Bulan")
 
+hier_query = pd.DataFrame({
+    "Kondisi": [kondisi], "Generasi": [generasi], "Variant_Normalized": [variant], "Storage": [storage],
+})
+HIER_DEPTH_LABEL = {1: "Kondisi", 2: "Generasi", 3: "Variant", 4: "Produk"}
+pred_ordinal = month_ordinal(pred_date)
+
+grid_row = forecast_grid.read(product_key, pred_ordinal, interval_level)
+if grid_row is None:
+    needs_global = predict_hierarchical(hier_model, hier_query, bulan_index)[1][0] == 0
+    grid_row = tuple(predict_batch(
+        product_stats, hier_model, hier_query, bulan_index, interval_level,
+        global_models()[4] if needs_global else None, df["Gen_Num"].max(), price_ladder,
+    ).iloc[0][["Predicted", "Lower", "Upper"]])
+predicted_price, pred_lower, pred_upper = grid_row
+
 if product_key in product_models:
     pm = product_models[product_key]
-    if pm["model"] is not None:
-        predicted_price = pm["model"].predict([[bulan_index]])[0]
-        pred_method = "Per-Produk (Linear Trend)"
-        slope_per_month = pm["slope"]
+    hier_depth = 4
+    if pm["n_points"] > 2:
+        pred_method = f"Per-Produk ({TREND_MODES[trend_mode]})"
+        slope_per_month = product_stats.at[product_key, "slope"]
     else:
-        predicted_price = pm["last_price"]
-        pred_method = "Per-Produk (1 data point)"
-        slope_per_month = 0
-    predicted_price = max(predicted_price, 0)
+        pred_method = f"Hierarchical Pooled ({pm['n_points']} data point)"
+        prev_row = forecast_grid.read(product_key, pred_ordinal - 1, interval_level)
+        prev_price = prev_row[0] if prev_row else predict_hierarchical(hier_model, hier_query, bulan_index - 1)[0][0]
+        slope_per_month = predicted_price - prev_price
     has_product_data = True
 else:
     has_product_data = False
-    pred_method = "Global Model (produk tidak ditemukan)"
-    vt_map = {"Mini": 1, "e": 2, "Basic": 3, "Air": 4, "Plus": 5, "Pro": 6, "Pro Max": 7}
-    kt_map = {"BC": 1, "Second": 2, "New": 3}
-    depr_map = {"New": 0, "Second": -1, "BC": -2}
-    gen_num = int(generasi.split()[-1])
-    max_gen = df["Gen_Num"].max()
-    gen_age = max_gen - gen_num
-    inp = np.array([[
-        kt_map[kondisi], gen_num, vt_map.get(variant, 3), np.log2(storage),
-        bulan_index, kt_map[kondisi] * bulan_index, depr_map[kondisi] * bulan_index,
-        gen_age, gen_age * bulan_index,
-    ]])
-    predicted_price = max(global_results[best_global_model]["model"].predict(inp)[0], 0)
+    hier_depth = predict_hierarchical(hier_model, hier_query, bulan_index)[1][0]
+    on_ladder = predict_ladder(price_ladder, hier_query, bulan_index)[1][0]
+    if on_ladder:
+        pred_method = "Price Ladder (interpolasi Storage/Variant)"
+    elif hier_depth > 0:
+        pred_method = f"Hierarchical Pooled (level {HIER_DEPTH_LABEL[hier_depth]})"
+    else:
+        pred_method = "Global Model (produk tidak ditemukan)"
     slope_per_month = 0
 
 # ── Main Content ─────────────────────────────────────────────────────────────
@@ -114,20 +183,27 @@ with col1:
     | **Metode** | {pred_method} |
     """)
     if has_product_data:
-        if slope_per_month < -50000:
+        if slope_per_month < -TREND_THRESHOLD:
             st.info(f"📉 Tren: harga turun ~Rp {abs(slope_per_month):,.0f}/bulan")
-        elif slope_per_month > 50000:
+        elif slope_per_month > TREND_THRESHOLD:
             st.info(f"📈 Tren: harga naik ~Rp {slope_per_month:,.0f}/bulan")
         else:
             st.info("➡️ Harga relatif stabil")
         if bulan_index > max_bulan_index:
             months_beyond = bulan_index - max_bulan_index
             st.warning(f"⚠️ Prediksi {months_beyond} bulan di luar data terakhir")
+    elif on_ladder:
+        st.warning("⚠️ Kombinasi produk ini tidak ada di dataset — diinterpolasi dari tangga harga Storage/Variant")
+    elif hier_depth > 0:
+        st.warning("⚠️ Kombinasi produk ini tidak ada di dataset — menggunakan model hierarchical pooled")
     else:
         st.warning("⚠️ Kombinasi produk ini tidak ada di dataset — menggunakan model global")
 
 with col2:
     st.metric(label="Harga Prediksi", value=f"Rp {predicted_price:,.0f}")
+    st.caption(
+        f"Interval {interval_level:.0%}: Rp {pred_lower:,.0f} – Rp {pred_upper:,.0f}"
+    )
     actual_row = df[(df["Product_Key"] == product_key) & (df["Bulan"] == pred_date)]
     if not actual_row.empty:
         actual_price = actual_row["Harga"].mean()
@@ -157,13 +233,21 @@ if has_product_data and len(product_history) >= 2:
         all_indices.append(last_idx + i)
 
     pred_dates = [min_date + pd.DateOffset(months=int(idx)) for idx in all_indices]
-    if pm_info["model"] is not None:
-        pred_prices = pm_info["model"].predict(np.array(all_indices).reshape(-1, 1)).tolist()
-        pred_prices = [max(p, 0) for p in pred_prices]
-    else:
-        pred_prices = [pm_info["last_price"]] * len(all_indices)
+    proj = forecast_grid.series(product_key, [month_ordinal(d) for d in pred_dates], interval_level)
+    if proj is None:
+        proj = predict_batch(
+            product_stats, hier_model, hier_query.loc[[0] * len(all_indices)].reset_index(drop=True),
+            np.array(all_indices), interval_level,
+        )[["Predicted", "Lower", "Upper"]].to_numpy()
+    pred_prices = proj[:, 0].tolist()
 
     fig_hist = go.Figure()
+    fig_hist.add_trace(go.Scatter(
+        x=pred_dates + pred_dates[::-1],
+        y=proj[:, 2].tolist() + proj[:, 1].tolist()[::-1],
+        fill="toself", fillcolor="rgba(239,85,59,0.15)", line=dict(width=0),
+        name=f"Interval {interval_level:.0%}", hoverinfo="skip",
+    ))
     fig_hist.add_trace(go.Scatter(
         x=hist_dates, y=hist_prices, mode="lines+markers", name="Harga Aktual",
         line=dict(color="#00CC96", width=3), marker=dict(size=10),
@@ -183,29 +267,45 @@ if has_product_data and len(product_history) >= 2:
     )
     st.plotly_chart(fig_hist, use_container_width=True)
 
+first_render_seconds = time.perf_counter() - run_start
+
 # ── Tabs ─────────────────────────────────────────────────────────────────────
-tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs([
-    "📊 Evaluasi Model", "📈 Tren Harga", "⚔️ Versus",
+tab1, tab2, tab3, tab4, tab5, tab6, tab7, tab8 = st.tabs([
+    "📊 Evaluasi Model", "📈 Tren Harga", "⚔️ Versus", "🔮 Simulasi", "🚨 Alerts",
     "🗺️ Heatmap", "🔍 Analisis Data", "📋 Data Lengkap",
 ])
 
-with tab1:
-    tab_evaluasi.render(eval_df, global_results)
-
 with tab2:
-    tab_tren.render(df, kondisi, generasi, variant, kondisi_options, product_models)
+    tab_tren.render(df, kondisi, generasi, variant, kondisi_options, product_models, product_stats)
 
 with tab3:
     tab_versus.render(df)
 
 with tab4:
-    tab_heatmap.render(df, kondisi_options)
+    tab_simulasi.render(df, product_stats, hier_model, interval_level, price_ladder)
 
 with tab5:
-    tab_analisis.render(df)
+    tab_alerts.render(df, product_stats)
 
 with tab6:
-    tab_data.render(df)
+    tab_heatmap.render(df, kondisi_options)
+
+with tab7:
+    tab_analisis.render(df)
+
+with tab8:
+    tab_data.render(df, quarantine)
+
+# Filled last so the other tabs are on screen while the global models finish
+with tab1:
+    with st.spinner("Menunggu model global selesai dilatih..."):
+        global_results, best_global_model, compact_global, compact_report, _ = global_models()
+        hier_benchmark = benchmark_hierarchical(df)
+        trend_modes_eval = evaluate_trend_modes(df)
+    tab_evaluasi.render(
+        eval_df, global_results, hier_benchmark, best_global_model, compact_global, compact_report, search_result,
+        trend_modes_eval,
+    )
 
 # ── Footer ───────────────────────────────────────────────────────────────────
 st.markdown("---")
@@ -214,5 +314,6 @@ if not eval_df.empty:
         f"📊 **Model Per-Produk** — MAPE: {eval_df['APE'].mean():.2f}% | "
         f"MAE: Rp {eval_df['Error'].abs().mean():,.0f} | "
         f"Total Produk: {len(product_models)} | "
-        f"Global Fallback: {best_global_model} (R²: {global_results[best_global_model]['r2']:.4f})"
+        f"Global Fallback: {best_global_model} (R²: {global_results[best_global_model]['r2']:.4f}) | "
+        f"Render pertama: {first_render_seconds:.2f} detik"
     )
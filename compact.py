@@ -0,0 +1,184 @@
+"""Compact inference format for the global tree ensembles.
+
+The fitted sklearn/XGBoost objects are compiled into flat node arrays
+(feature, threshold, left, right, value) that are traversed with NumPy, level by
+level, for all trees and rows at once.
+"""
+
+import json
+import pickle
+import time
+
+import numpy as np
+
+
+class CompactEnsemble:
+    """Flattened tree ensemble: ``base + scale * combine(leaf values)``."""
+
+    def __init__(self, feature, threshold, left, right, value, roots, depth, base, scale, average, float32=False):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.depth = depth
+        self.base = base
+        self.scale = scale
+        self.average = average
+        self.float32 = float32
+
+    def predict(self, X):
+        # Trees compare float32 inputs, same as sklearn and XGBoost do internally
+        X = np.asarray(X, dtype=np.float32).astype(np.float64)
+        rows = np.arange(len(X))[:, None]
+        node = np.broadcast_to(self.roots, (len(X), len(self.roots)))
+        for _ in range(self.depth):
+            go_left = X[rows, self.feature[node]] <= self.threshold[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+        leaves = self.value[node]
+        if self.float32:
+            # XGBoost adds trees one by one in float32; cumsum keeps that order
+            acc = np.column_stack([np.full(len(X), self.base), leaves]).astype(np.float32)
+            return np.cumsum(acc, axis=1, dtype=np.float32)[:, -1]
+        total = leaves.mean(axis=1) if self.average else leaves.sum(axis=1)
+        return self.base + self.scale * total
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in (self.feature, self.threshold, self.left, self.right, self.value, self.roots))
+
+    def save(self, path):
+        np.savez(
+            path, feature=self.feature, threshold=self.threshold, left=self.left, right=self.right,
+            value=self.value, roots=self.roots,
+            meta=np.array([self.depth, self.base, self.scale, float(self.average), float(self.float32)]),
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as z:
+            depth, base, scale, average, float32 = z["meta"]
+            return cls(z["feature"], z["threshold"], z["left"], z["right"], z["value"], z["roots"],
+                       int(depth), float(base), float(scale), bool(average), bool(float32))
+
+
+def _pack(trees, base, scale, average, float32=False):
+    """Concatenate per-tree (feature, threshold, left, right, value) arrays with offset children."""
+    feature, threshold, left, right, value, roots = [], [], [], [], [], []
+    offset, depth = 0, 0
+    for f, thr, lft, rgt, val, d in trees:
+        leaf = lft < 0
+        ids = np.arange(len(f))
+        # Leaves point to themselves so extra traversal steps are no-ops
+        feature.append(np.where(leaf, 0, f))
+        threshold.append(np.where(leaf, np.inf, thr))
+        left.append(np.where(leaf, ids, lft) + offset)
+        right.append(np.where(leaf, ids, rgt) + offset)
+        value.append(val)
+        roots.append(offset)
+        offset += len(f)
+        depth = max(depth, d)
+    return CompactEnsemble(
+        np.concatenate(feature).astype(np.int32), np.concatenate(threshold).astype(np.float64),
+        np.concatenate(left).astype(np.int32), np.concatenate(right).astype(np.int32),
+        np.concatenate(value).astype(np.float64), np.array(roots, dtype=np.int32),
+        depth, float(base), float(scale), average, float32,
+    )
+
+
+def _sklearn_tree(tree):
+    t = tree.tree_
+    return t.feature, t.threshold, t.children_left, t.children_right, t.value[:, 0, 0], t.max_depth
+
+
+def _xgboost_trees(model):
+    raw = json.loads(model.get_booster().save_raw("json"))
+    learner = raw["learner"]
+    trees = []
+    for tree in learner["gradient_booster"]["model"]["trees"]:
+        lft = np.array(tree["left_children"])
+        rgt = np.array(tree["right_children"])
+        # Leaves store their weight in split_conditions
+        cond = np.array(tree["split_conditions"], dtype=np.float32)
+        leaf = lft < 0
+        # XGBoost goes left when x < split; with float32 inputs that is x <= nextafter(split, -inf)
+        thr = np.nextafter(cond, np.float32(-np.inf)).astype(np.float64)
+        val = np.where(leaf, cond.astype(np.float64), 0.0)
+        trees.append((np.array(tree["split_indices"]), thr, lft, rgt, val, _tree_depth(lft, rgt)))
+    base = learner["learner_model_param"]["base_score"].strip("[]")
+    return trees, float(base)
+
+
+def _tree_depth(left, right):
+    depth, frontier = 0, [0]
+    while True:
+        frontier = [c for n in frontier for c in (left[n], right[n]) if c >= 0]
+        if not frontier:
+            return depth
+        depth += 1
+
+
+def compile_model(model):
+    """Compile a fitted RandomForest / GradientBoosting / XGBoost regressor."""
+    name = type(model).__name__
+    if name == "RandomForestRegressor":
+        return _pack([_sklearn_tree(t) for t in model.estimators_], 0.0, 1.0, average=True)
+    if name == "GradientBoostingRegressor":
+        init = float(np.ravel(model.init_.constant_)[0])
+        return _pack([_sklearn_tree(t) for t in model.estimators_[:, 0]], init, model.learning_rate, average=False)
+    if name == "XGBRegressor":
+        trees, base = _xgboost_trees(model)
+        return _pack(trees, base, 1.0, average=False, float32=True)
+    raise TypeError(f"Tidak bisa mengompilasi model {name}")
+
+
+def export_xgboost(model, path):
+    """Save an XGBoost model in its native JSON (``.json``) or UBJSON (``.ubj``) format."""
+    model.get_booster().save_model(path)
+    return path
+
+
+def xgboost_raw(model, fmt="ubj"):
+    """Native XGBoost model bytes (``"json"`` or ``"ubj"``), e.g. for a download button."""
+    return bytes(model.get_booster().save_raw(fmt))
+
+
+def compare_compact(model, compact, X_test, y_test, n_latency=200):
+    """Parity and footprint of the compiled model against the original on the test split."""
+    y_orig = model.predict(X_test)
+    y_comp = compact.predict(X_test)
+
+    row = X_test[:1]
+    start = time.perf_counter()
+    for _ in range(n_latency):
+        model.predict(row)
+    orig_latency = (time.perf_counter() - start) / n_latency
+    start = time.perf_counter()
+    for _ in range(n_latency):
+        compact.predict(row)
+    comp_latency = (time.perf_counter() - start) / n_latency
+
+    orig_blob = pickle.dumps(model)
+    comp_blob = pickle.dumps(compact)
+    start = time.perf_counter()
+    pickle.loads(orig_blob)
+    orig_load = time.perf_counter() - start
+    start = time.perf_counter()
+    pickle.loads(comp_blob)
+    comp_load = time.perf_counter() - start
+
+    max_abs_diff = float(np.max(np.abs(y_orig - y_comp)))
+    return {
+        "parity_ok": max_abs_diff <= 1e-6 * float(np.max(np.abs(y_orig))),
+        "max_abs_diff": max_abs_diff,
+        "mape_orig": float(np.mean(np.abs(y_test - y_orig) / y_test) * 100),
+        "mape_compact": float(np.mean(np.abs(y_test - y_comp) / y_test) * 100),
+        "n_nodes": int(len(compact.feature)),
+        "bytes_orig": len(orig_blob),
+        "bytes_compact": len(comp_blob),
+        "load_orig": orig_load,
+        "load_compact": comp_load,
+        "latency_orig": orig_latency,
+        "latency_compact": comp_latency,
+    }
@@ -1,30 +1,112 @@
 """Data loading and preprocessing module."""
 
+import numpy as np
 import pandas as pd
 import streamlit as st
 
+# Outlier screening: a price is quarantined when its log distance to the rolling
+# median of neighbouring months exceeds max(MAD_K × robust scale, log(1 + MIN_JUMP)).
+MAD_K = 5.0
+MIN_JUMP = 0.5
+NEIGHBOUR_WINDOW = 5
+# Kondisi ordering (New ≥ Second ≥ BC) is checked with this relative slack
+ORDER_TOL = 0.05
 
-@st.cache_data
-def load_data():
-    """Load and preprocess the iPhone price dataset."""
-    df = pd.read_csv("DatasetHargaIphone.csv")
+# Color variants → base variant
+VARIANT_MAP = {
+    "Midnight": "Basic",
+    "Starlight": "Basic",
+    "Sage": "Basic",
+    "Pro Silver": "Pro",
+    "Pro Max Silver": "Pro Max",
+}
+
+
+def screen_prices(df):
+    """Split rows into (clean, quarantine) using vectorized per-product robust statistics.
+
+    Two checks, both in one sort + grouped pass:
+
+    * ``lonjakan_harga`` — log price vs the centered rolling median of the product's
+      neighbouring months, scaled by the product's MAD (products with ≥ 3 points).
+    * ``urutan_kondisi`` — within a Generasi/Variant/Storage/Bulan cell the price must
+      respect New ≥ Second ≥ BC; of a violating pair, the row further from its own
+      history is quarantined (both when tied). A product with fewer than 3 points has
+      no history to measure against, so it counts as furthest: a short-history row is
+      never trusted over a well-supported one.
+    """
+    df = df.sort_values(["Product_Key", "Bulan"], kind="stable")
+    lp = np.log(df["Harga"].astype(float))
+    codes = pd.factorize(df["Product_Key"])[0]
+
+    # Centered rolling median over neighbouring months of the same product
+    lp_arr = lp.to_numpy()
+    half = NEIGHBOUR_WINDOW // 2
+    window = np.full((len(lp_arr), NEIGHBOUR_WINDOW), np.nan)
+    for j, off in enumerate(range(-half, half + 1)):
+        src = np.arange(len(lp_arr)) + off
+        ok = (src >= 0) & (src < len(lp_arr))
+        ok[ok] = codes[src[ok]] == codes[ok]
+        window[ok, j] = lp_arr[src[ok]]
+    ref = pd.Series(np.nanmedian(window, axis=1), index=df.index)
+    dev = lp - ref
+    n = pd.Series(np.bincount(codes)[codes], index=df.index)
+    scale = 1.4826 * dev.abs().groupby(codes).transform("median")
+    limit = np.maximum(MAD_K * scale, np.log1p(MIN_JUMP))
+    jump = (n >= 3) & (dev.abs() > limit)
+
+    # Kondisi ordering: nearest present tier above/below in the same cell
+    cell_cols = ["Generasi", "Variant_Normalized", "Storage", "Bulan"]
+    dev_abs = dev.abs().where(n >= 3, np.inf)
+    tiers = df[cell_cols + ["Kondisi_Tier"]].assign(_lp=lp, _dev=dev_abs)
+    pivot = tiers.groupby(cell_cols + ["Kondisi_Tier"])[["_lp", "_dev"]].mean().unstack("Kondisi_Tier")
+    lp_p, dev_p = pivot["_lp"], pivot["_dev"]
+    present = lp_p.notna()
+    above_lp = lp_p.bfill(axis=1).shift(-1, axis=1)
+    above_dev = dev_p.where(present).bfill(axis=1).shift(-1, axis=1)
+    below_lp = lp_p.ffill(axis=1).shift(1, axis=1)
+    below_dev = dev_p.where(present).ffill(axis=1).shift(1, axis=1)
+    bounds = pd.concat(
+        {"above_lp": above_lp.stack(), "above_dev": above_dev.stack(),
+         "below_lp": below_lp.stack(), "below_dev": below_dev.stack()}, axis=1,
+    )
+    row_bounds = bounds.reindex(pd.MultiIndex.from_frame(df[cell_cols + ["Kondisi_Tier"]]))
+    tol = np.log1p(ORDER_TOL)
+    lp_v, dev_v = lp.to_numpy(), dev_abs.to_numpy()
+    too_high = (lp_v > row_bounds["above_lp"].to_numpy() + tol) & (dev_v >= row_bounds["above_dev"].to_numpy())
+    too_low = (lp_v < row_bounds["below_lp"].to_numpy() - tol) & (dev_v >= row_bounds["below_dev"].to_numpy())
+    order = pd.Series(too_high | too_low, index=df.index)
+
+    reason = pd.Series(np.where(jump, "lonjakan_harga", np.where(order, "urutan_kondisi", "")), index=df.index)
+    bad = reason != ""
+    quarantine = df[bad].assign(Alasan=reason[bad], Deviasi_Log=dev[bad], Harga_Referensi=np.exp(ref[bad]))
+    return df[~bad].sort_index(), quarantine
+
+
+def _prepare(df):
+    """Validate the raw CSV frame and add the derived columns; returns ``(df, rejected)``."""
+    # Basic validity: parseable date, positive price, known Kondisi, Variant and a whole positive Storage
+    raw = df[["Harga", "Storage"]]
+    df["Bulan"] = pd.to_datetime(df["Bulan"], errors="coerce")
+    df["Harga"] = pd.to_numeric(df["Harga"], errors="coerce")
+    df["Storage"] = pd.to_numeric(df["Storage"], errors="coerce")
+    invalid = (
+        df["Bulan"].isna() | df["Harga"].isna() | (df["Harga"] <= 0) |
+        ~df["Kondisi"].isin(["BC", "Second", "New"]) | ~df["Generasi"].astype(str).str.contains(r"\d") |
+        df["Variant"].isna() | ~(df["Storage"] > 0) | (df["Storage"] % 1 != 0)
+    )
+    # The report keeps the cells as read, not the NaN left by parsing
+    rejected = df[invalid].assign(Harga=raw["Harga"][invalid], Storage=raw["Storage"][invalid], Alasan="tidak_valid")
+    df = df[~invalid]
 
     # Fix Storage 1000 → 1024
-    df["Storage"] = df["Storage"].replace(1000, 1024)
+    df["Storage"] = df["Storage"].astype(int).replace(1000, 1024)
 
     # Normalize variant: color variants → base variant
-    variant_map = {
-        "Midnight": "Basic",
-        "Starlight": "Basic",
-        "Sage": "Basic",
-        "Pro Silver": "Pro",
-        "Pro Max Silver": "Pro Max",
-    }
     df["Variant_Original"] = df["Variant"]
-    df["Variant_Normalized"] = df["Variant"].replace(variant_map)
+    df["Variant_Normalized"] = df["Variant"].replace(VARIANT_MAP)
 
     # Parse date
-    df["Bulan"] = pd.to_datetime(df["Bulan"])
     df["Tahun"] = df["Bulan"].dt.year
     df["Bulan_Num"] = df["Bulan"].dt.month
 
@@ -49,4 +131,64 @@ def load_data():
         df["Variant_Normalized"] + "|" + df["Storage"].astype(str)
     )
 
-    return df
+    return df, rejected
+
+
+def _load_and_screen():
+    df, rejected = _prepare(pd.read_csv("DatasetHargaIphone.csv"))
+    df, quarantine = screen_prices(df)
+    quarantine = pd.concat([rejected, quarantine], ignore_index=True)
+    return df, quarantine
+
+
+def freeze(df):
+    """The same frame rebuilt on read-only column arrays, without copying them.
+
+    Shared frames are served from ``st.cache_resource`` to every session: writing
+    into their arrays raises, and assigning on the shared object itself
+    (``df[col] = ``, ``.loc[...] = ``) would change it for every session. Derive
+    new frames with filters or ``assign``; copy-on-write keeps those views until written.
+    """
+    cols = {}
+    for col in df.columns:
+        values = df[col].array
+        if isinstance(values.dtype, np.dtype):
+            values = df[col].to_numpy().view()
+            values.flags.writeable = False
+        cols[col] = values
+    return pd.DataFrame(cols, index=df.index, copy=False)
+
+
+@st.cache_resource
+def _screened_data():
+    clean, quarantine = _load_and_screen()
+    return freeze(clean), freeze(quarantine)
+
+
+@st.cache_resource
+def load_data():
+    """Load and preprocess the iPhone price dataset (quarantined rows excluded).
+
+    One shared, read-only frame for all sessions (see ``freeze``); never assign
+    columns on it in place.
+    """
+    return _screened_data()[0]
+
+
+@st.cache_resource
+def load_quarantine():
+    """Rows rejected by validation or outlier screening, with the reason (``Alasan``)."""
+    return _screened_data()[1]
+
+
+if __name__ == "__main__":
+    # Regression check: a mistyped extra zero on a short-history product must be the
+    # row quarantined, not the well-supported row it is compared with.
+    raw = pd.read_csv("DatasetHargaIphone.csv")
+    cell = dict(Bulan="2026-01-01", Generasi="iPhone 16", Variant="Pro Max", Storage=1024)
+    row = (raw[list(cell)] == pd.Series(cell)).all(axis=1) & (raw["Kondisi"] == "Second")
+    raw.loc[row, "Harga"] = raw.loc[row, "Harga"] * 10
+    clean, quarantine = screen_prices(_prepare(raw)[0])
+    flagged = quarantine[(quarantine[list(cell)] == pd.Series(cell).astype(object)).all(axis=1)]
+    assert flagged["Kondisi"].tolist() == ["Second"], flagged
+    print(f"OK: {len(flagged)} baris dikarantina ({flagged['Alasan'].iloc[0]}), baris New tetap dipakai")
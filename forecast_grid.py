@@ -0,0 +1,166 @@
+"""Precomputed forecast grid: every product × every sidebar month, memory-mapped.
+
+The sidebar can only ask for months 2025-01 … 2030-12, so predictions and
+intervals for all products are materialized once into a ``.npy`` array of shape
+(product, month ordinal, interval level, [Predicted, Lower, Upper]) and read back
+with ``mmap_mode="r"``. A fingerprint of the data and the chosen models is
+part of the file name, so a change of data or models (or ``refresh_forecast_grid``)
+builds a new grid instead of overwriting one another session may still be reading.
+Grids are written under a temporary name and renamed into place. A build deletes
+the grids no trend mode of the current data can use (older data or
+``GRID_VERSION``), so sessions building grids for different trend modes at the
+same time do not remove each other's files; ``refresh_forecast_grid`` deletes all.
+"""
+
+import glob
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from models import data_fingerprint, predict_batch, TREND_MODES
+
+GRID_START = pd.Timestamp("2025-01-01")
+GRID_MONTHS = 72
+GRID_LEVELS = (0.8, 0.9, 0.95)
+GRID_DIR = ".cache"
+# Bump when what a grid cell holds changes without a change of data or trend mode
+GRID_VERSION = 4  # 2: price ladder for missing combinations; 3: change-point intervals on the last segment;
+# 4: residual variances shrunk toward the pooled one
+
+
+def month_ordinal(ts):
+    """Grid column of a (first-of-month) timestamp."""
+    return (ts.year - GRID_START.year) * 12 + ts.month - GRID_START.month
+
+
+def models_fingerprint(df, model_name):
+    """Hash of the training data, the model choice (trend mode) and ``GRID_VERSION``; changes whenever the models do."""
+    return hashlib.sha1(f"{data_fingerprint(df)}|{model_name}|{GRID_VERSION}".encode()).hexdigest()
+
+
+def grid_products(df):
+    """Products selectable in the sidebar: every Generasi/Variant/Storage under each Kondisi carrying that Generasi."""
+    gvs = df[["Generasi", "Variant_Normalized", "Storage"]].drop_duplicates()
+    kg = df[["Kondisi", "Generasi"]].drop_duplicates()
+    products = kg.merge(gvs, on="Generasi")[["Kondisi", "Generasi", "Variant_Normalized", "Storage"]]
+    return products.sort_values(list(products.columns)).reset_index(drop=True)
+
+
+class ForecastGrid:
+    """Read-only view over a materialized grid."""
+
+    def __init__(self, path):
+        with open(path + ".json") as f:
+            meta = json.load(f)
+        self.fingerprint = meta["fingerprint"]
+        self.levels = meta["levels"]
+        self.code = {k: i for i, k in enumerate(meta["keys"])}
+        self.values = np.load(path, mmap_mode="r")
+
+    def read(self, product_key, ordinal, level):
+        """``(predicted, lower, upper)`` for one product/month, or None if outside the grid or not filled."""
+        code = self.code.get(product_key)
+        if code is None or not 0 <= ordinal < GRID_MONTHS or level not in self.levels:
+            return None
+        row = self.values[code, ordinal, self.levels.index(level)]
+        if np.isnan(row).any():
+            return None
+        return tuple(float(v) for v in row)
+
+    def series(self, product_key, ordinals, level):
+        """Array of shape (len(ordinals), 3) for a projection line, or None if any month falls outside."""
+        ordinals = np.asarray(ordinals)
+        code = self.code.get(product_key)
+        if code is None or ordinals.min() < 0 or ordinals.max() >= GRID_MONTHS or level not in self.levels:
+            return None
+        out = np.asarray(self.values[code, ordinals, self.levels.index(level)])
+        return None if np.isnan(out).any() else out
+
+
+def grid_path(fingerprint, directory=GRID_DIR):
+    return os.path.join(directory, f"forecast_grid_{fingerprint[:16]}.npy")
+
+
+def _remove_grids(directory, keep=()):
+    # Unlinking is safe for grids still memory-mapped elsewhere; the mapping stays valid.
+    # Temporary files belong to builds in progress and are left to them.
+    keep = {q for path in keep for q in (path, path + ".json")}
+    for p in glob.glob(os.path.join(directory, "forecast_grid_*.npy*")):
+        if not p.endswith(".tmp") and p not in keep:
+            try:
+                os.remove(p)
+            except FileNotFoundError:
+                pass  # pruned by a concurrent build
+
+
+def build_forecast_grid(df, product_stats, hier, global_result, fingerprint, directory=GRID_DIR, ladder=None):
+    """Materialize the grid (``.npy`` + ``.json`` sidecar) under ``directory`` and return it.
+
+    Every grid product shares a Kondisi+Generasi node with the data, so the hierarchy
+    (or the price ``ladder``, when given) always places it; ``global_result`` may be
+    None, leaving any unplaced cell NaN.
+    """
+    path = grid_path(fingerprint, directory)
+    products = grid_products(df)
+    months = pd.date_range(GRID_START, periods=GRID_MONTHS, freq="MS")
+    bulan_index = np.round((months - df["Bulan"].min()).days / 30).astype(int)
+
+    n = len(products)
+    query = products.loc[np.repeat(np.arange(n), GRID_MONTHS)].reset_index(drop=True)
+    t = np.tile(bulan_index, n)
+
+    os.makedirs(directory, exist_ok=True)
+    tmp = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+    values = np.lib.format.open_memmap(tmp, mode="w+", dtype=np.float64, shape=(n, GRID_MONTHS, len(GRID_LEVELS), 3))
+    for j, level in enumerate(GRID_LEVELS):
+        out = predict_batch(product_stats, hier, query, t, level, global_result, df["Gen_Num"].max(), ladder)
+        values[:, :, j, :] = out[["Predicted", "Lower", "Upper"]].to_numpy(dtype=float).reshape(n, GRID_MONTHS, 3)
+    values.flush()
+    del values
+
+    keys = (products["Kondisi"] + "|" + products["Generasi"] + "|" +
+            products["Variant_Normalized"] + "|" + products["Storage"].astype(str)).tolist()
+    with open(tmp + ".json.tmp", "w") as f:
+        json.dump({"fingerprint": fingerprint, "levels": list(GRID_LEVELS), "keys": keys}, f)
+    # Write-then-rename; a concurrent build of the same fingerprint writes identical files
+    os.replace(tmp, path)
+    os.replace(tmp + ".json.tmp", path + ".json")
+    # Grids of older data or GRID_VERSION are never read again; every trend mode's current one is kept
+    _remove_grids(directory, keep={grid_path(models_fingerprint(df, m), directory) for m in TREND_MODES} | {path})
+    return ForecastGrid(path)
+
+
+@st.cache_resource
+def get_forecast_grid(_df, _product_stats, _hier, _global_result, fingerprint, directory=GRID_DIR, _ladder=None):
+    """Load the grid for ``fingerprint`` from disk, building it when missing."""
+    path = grid_path(fingerprint, directory)
+    if os.path.exists(path) and os.path.exists(path + ".json"):
+        grid = ForecastGrid(path)
+        if grid.fingerprint == fingerprint:
+            return grid
+    return build_forecast_grid(_df, _product_stats, _hier, _global_result, fingerprint, directory, _ladder)
+
+
+def refresh_forecast_grid(directory=GRID_DIR):
+    """Refresh hook: drop the on-disk grids and the cached handles so the next run rebuilds."""
+    get_forecast_grid.clear()
+    if os.path.isdir(directory):
+        _remove_grids(directory)
+
+
+if __name__ == "__main__":
+    from data_loader import load_data
+    from models import build_product_stats, build_hierarchical_model, fit_price_ladder
+
+    df = load_data()
+    product_stats, hier = build_product_stats(df), build_hierarchical_model(df)
+    grid = build_forecast_grid(
+        df, product_stats, hier, None, models_fingerprint(df, "ols"),
+        ladder=fit_price_ladder(df, product_stats, hier),
+    )
+    print(f"Forecast grid: {len(grid.code)} produk × {GRID_MONTHS} bulan → {GRID_DIR}/")
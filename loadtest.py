@@ -0,0 +1,115 @@
+"""Load test: N concurrent app sessions in one process, reporting memory per session.
+
+Each session is a ``streamlit.testing`` AppTest running ``app.py`` with its own
+session state, all in this process, so they share ``st.cache_resource`` the way
+sessions on one server do. Sessions pick different products in the sidebar and
+stay alive (like connected users) until memory is measured.
+
+    python3 loadtest.py --sessions 50 --workers 8 [--scale 100] [--tracemalloc]
+
+``--scale k`` runs against the dataset repeated k times (in a temporary
+directory) to see how per-session memory grows with the data.
+"""
+
+import argparse
+import gc
+import os
+import resource
+import shutil
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+APP = os.path.join(ROOT, "app.py")
+DATA = "DatasetHargaIphone.csv"
+
+
+def rss_mb():
+    """Current resident set size in MB (``/proc``; peak RSS where that is missing)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_session(i, timeout=600):
+    """One session: first render, then switch Generasi (a rerun). Returns (AppTest, run seconds)."""
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(APP, default_timeout=timeout)
+    timings = []
+    start = time.perf_counter()
+    at.run()
+    timings.append(time.perf_counter() - start)
+    gen = next(sb for sb in at.sidebar.selectbox if sb.label == "Generasi")
+    gen.set_value(gen.options[i % len(gen.options)])
+    start = time.perf_counter()
+    at.run()
+    timings.append(time.perf_counter() - start)
+    if at.exception:
+        raise RuntimeError(f"Sesi {i}: {at.exception[0].message}")
+    return at, timings
+
+
+def load_test(sessions=50, workers=8, trace=False):
+    """Run ``sessions`` sessions on ``workers`` threads; returns a dict of memory and latency figures."""
+    # Warm-up: loads data and fills the shared caches, which are not per-session memory
+    warm, _ = run_session(0)
+    del warm
+    gc.collect()
+    base_rss = rss_mb()
+    if trace:
+        tracemalloc.start()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(run_session, range(sessions)))
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    rss = rss_mb()
+    traced = None
+    if trace:
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        traced = (current / 2 ** 20, peak / 2 ** 20)
+
+    runs = np.array([t for _, timings in results for t in timings])
+    return {
+        "sessions": sessions, "workers": workers, "elapsed": elapsed,
+        "rss_base_mb": base_rss, "rss_mb": rss, "per_session_mb": (rss - base_rss) / sessions,
+        "traced_mb": traced, "run_p50": float(np.median(runs)), "run_p95": float(np.percentile(runs, 95)),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--scale", type=int, default=1, help="ulangi dataset k kali")
+    parser.add_argument("--tracemalloc", action="store_true", help="juga ukur alokasi Python (lebih lambat)")
+    args = parser.parse_args()
+
+    workdir = ROOT
+    if args.scale > 1:
+        # The app reads the CSV (and writes .cache/) relative to the working directory
+        workdir = tempfile.mkdtemp(prefix="loadtest_")
+        raw = pd.read_csv(os.path.join(ROOT, DATA))
+        pd.concat([raw] * args.scale, ignore_index=True).to_csv(os.path.join(workdir, DATA), index=False)
+    os.chdir(workdir)
+    try:
+        r = load_test(args.sessions, args.workers, args.tracemalloc)
+    finally:
+        if workdir != ROOT:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"Data: {args.scale}× dataset, sesi: {r['sessions']} ({r['workers']} paralel) dalam {r['elapsed']:.1f} detik")
+    print(f"RSS: {r['rss_base_mb']:.0f} MB → {r['rss_mb']:.0f} MB  ({r['per_session_mb']:.2f} MB/sesi)")
+    if r["traced_mb"]:
+        current, peak = r["traced_mb"]
+        print(f"tracemalloc: {current / r['sessions']:.2f} MB/sesi tertahan, puncak {peak:.0f} MB")
+    print(f"Waktu run: p50 {r['run_p50']:.2f} s, p95 {r['run_p95']:.2f} s")
@@ -1,13 +1,45 @@
 """ML models: per-product linear and global ensemble models."""
 
+import glob
+import hashlib
+import math
+import os
+import pickle
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import numpy as np
 import pandas as pd
 import streamlit as st
-from sklearn.linear_model import LinearRegression
-from sklearn.model_selection import cross_val_score, train_test_split
-from sklearn.metrics import mean_absolute_error, mean_absolute_percentage_error, r2_score
-from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
-from xgboost import XGBRegressor
+
+from compact import compile_model, compare_compact
+
+# sklearn, xgboost, scipy and joblib take seconds to import, so they are imported
+# inside the functions that use them. The first render still needs scipy for the
+# prediction intervals (and the forecast grid on a cold start); sklearn, xgboost
+# and joblib only load on the background training thread.
+
+MODEL_CACHE_DIR = ".cache"
+# Bump when _train_global_models or the CompactEnsemble layout changes, so pickled bundles are retrained
+MODEL_CACHE_VERSION = 1
+
+
+def _line_fit(x, y):
+    """Least-squares ``(slope, intercept)`` of y on x; slope 0 when x is constant."""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    xc = x - x.mean()
+    sxx = (xc ** 2).sum()
+    slope = (xc * (y - y.mean())).sum() / sxx if sxx > 0 else 0.0
+    return slope, y.mean() - slope * x.mean()
+
+
+def _r2(y, y_hat):
+    tss = ((y - y.mean()) ** 2).sum()
+    rss = ((y - y_hat) ** 2).sum()
+    if tss == 0:
+        return 1.0 if rss == 0 else 0.0
+    return 1 - rss / tss
 
 
 @st.cache_resource
@@ -21,23 +53,20 @@ def build_product_models(_df):
         y_t = grp["Harga"].values
 
         if len(grp) >= 2:
-            lr = LinearRegression()
-            lr.fit(X_t, y_t)
+            slope, intercept = _line_fit(X_t[:, 0], y_t)
             product_models[pk] = {
-                "model": lr,
-                "slope": lr.coef_[0],
-                "intercept": lr.intercept_,
+                "slope": slope,
+                "intercept": intercept,
                 "n_points": len(grp),
                 "last_price": y_t[-1],
                 "first_price": y_t[0],
                 "last_index": X_t[-1, 0],
                 "prices": y_t,
                 "indices": X_t.ravel(),
-                "r2": r2_score(y_t, lr.predict(X_t)) if len(grp) > 2 else 1.0,
+                "r2": _r2(y_t, intercept + slope * X_t[:, 0]) if len(grp) > 2 else 1.0,
             }
         else:
             product_models[pk] = {
-                "model": None,
                 "slope": 0,
                 "intercept": y_t[0],
                 "n_points": 1,
@@ -52,25 +81,51 @@ def build_product_models(_df):
     return product_models
 
 
-@st.cache_resource
-def train_global_models(_df):
-    """Train global ML models (XGBoost, RF, GB) as fallback."""
-    df2 = _df.copy()
-    df2["Storage_Log"] = np.log2(df2["Storage"])
-    df2["Kondisi_x_Bulan"] = df2["Kondisi_Tier"] * df2["Bulan_Index"]
+def _global_design(_df):
+    """Global-model feature matrix and target."""
     depr = {"New": 0, "Second": -1, "BC": -2}
-    df2["Depr_Factor"] = df2["Kondisi"].map(depr)
-    df2["Depr_x_Bulan"] = df2["Depr_Factor"] * df2["Bulan_Index"]
-    max_gen = df2["Gen_Num"].max()
-    df2["Gen_Age"] = max_gen - df2["Gen_Num"]
-    df2["Age_x_Bulan"] = df2["Gen_Age"] * df2["Bulan_Index"]
+    max_gen = _df["Gen_Num"].max()
+    df2 = _df.assign(
+        Storage_Log=np.log2(_df["Storage"]),
+        Kondisi_x_Bulan=_df["Kondisi_Tier"] * _df["Bulan_Index"],
+        Depr_Factor=_df["Kondisi"].map(depr),
+        Gen_Age=max_gen - _df["Gen_Num"],
+    )
+    df2 = df2.assign(
+        Depr_x_Bulan=df2["Depr_Factor"] * df2["Bulan_Index"],
+        Age_x_Bulan=df2["Gen_Age"] * df2["Bulan_Index"],
+    )
 
     features = [
         "Kondisi_Tier", "Gen_Num", "Variant_Tier", "Storage_Log",
         "Bulan_Index", "Kondisi_x_Bulan", "Depr_x_Bulan", "Gen_Age", "Age_x_Bulan",
     ]
-    X = df2[features].values
-    y = df2["Harga"].values
+    return df2[features].values, df2["Harga"].values, features
+
+
+def _score_global(model, X, y, X_train, X_test, y_train, y_test):
+    """Fit on the random split and compute the metrics shown in the evaluation tab."""
+    from sklearn.metrics import mean_absolute_error, mean_absolute_percentage_error, r2_score
+    from sklearn.model_selection import cross_val_score
+
+    model.fit(X_train, y_train)
+    y_pred = model.predict(X_test)
+    cv_scores = cross_val_score(model, X, y, cv=3, scoring="r2")
+    return {
+        "model": model, "mae": mean_absolute_error(y_test, y_pred),
+        "mape": mean_absolute_percentage_error(y_test, y_pred) * 100, "r2": r2_score(y_test, y_pred),
+        "cv_r2_mean": cv_scores.mean(), "cv_r2_std": cv_scores.std(),
+        "X_test": X_test, "y_test": y_test, "y_pred": y_pred,
+    }
+
+
+def _train_global_models(_df):
+    """Train global ML models (XGBoost, RF, GB) as fallback."""
+    from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
+    from sklearn.model_selection import train_test_split
+    from xgboost import XGBRegressor
+
+    X, y, features = _global_design(_df)
     X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
 
     models = {
@@ -84,25 +139,181 @@ def train_global_models(_df):
 
     results = {}
     for name, model in models.items():
-        model.fit(X_train, y_train)
-        y_pred = model.predict(X_test)
-        mae = mean_absolute_error(y_test, y_pred)
-        mape = mean_absolute_percentage_error(y_test, y_pred) * 100
-        r2 = r2_score(y_test, y_pred)
-        cv_scores = cross_val_score(model, X, y, cv=3, scoring="r2")
-        results[name] = {
-            "model": model, "mae": mae, "mape": mape, "r2": r2,
-            "cv_r2_mean": cv_scores.mean(), "cv_r2_std": cv_scores.std(),
-            "y_test": y_test, "y_pred": y_pred,
-        }
+        results[name] = _score_global(model, X, y, X_train, X_test, y_train, y_test)
 
     best_name = min(results, key=lambda k: results[k]["mape"])
     return results, best_name, features
 
 
-@st.cache_data
+# ── Hyperparameter search (Hyperband over n_estimators) ──────────────────────
+SEARCH_SPACE = {
+    "XGBoost": {"max_depth": [3, 4, 5, 6, 8], "learning_rate": [0.03, 0.05, 0.1, 0.2, 0.3]},
+    "Random Forest": {"max_depth": [6, 8, 10, 12, 16]},
+}
+
+
+def _make_global_model(family, params, n_estimators, early_stopping=False):
+    from sklearn.ensemble import RandomForestRegressor
+    from xgboost import XGBRegressor
+
+    if family == "XGBoost":
+        return XGBRegressor(
+            n_estimators=n_estimators, subsample=0.8, colsample_bytree=0.8, random_state=42, n_jobs=1,
+            early_stopping_rounds=20 if early_stopping else None, **params,
+        )
+    return RandomForestRegressor(n_estimators=n_estimators, random_state=42, n_jobs=1, **params)
+
+
+def _run_trial(family, params, n_estimators, X_tr, y_tr, X_val, y_val):
+    from sklearn.metrics import mean_absolute_percentage_error
+
+    start = time.perf_counter()
+    model = _make_global_model(family, params, n_estimators, early_stopping=True)
+    if family == "XGBoost":
+        model.fit(X_tr, y_tr, eval_set=[(X_val, y_val)], verbose=False)
+        n_used = model.best_iteration + 1
+        depth = params["max_depth"]
+    else:
+        model.fit(X_tr, y_tr)
+        n_used = n_estimators
+        depth = max(e.tree_.max_depth for e in model.estimators_)
+    mape = mean_absolute_percentage_error(y_val, model.predict(X_val)) * 100
+    return {
+        "Model": family, **params, "n_estimators": n_estimators, "n_used": n_used,
+        "MAPE (%)": mape, "Cost": n_used * depth, "Fit (s)": time.perf_counter() - start,
+    }
+
+
+@st.cache_resource
+def search_global_models(_df, time_budget=20.0, tolerance=0.05, min_estimators=25, max_estimators=400, eta=3):
+    """Time-budgeted Hyperband search; returns the cheapest config within ``tolerance`` of the best MAPE.
+
+    Trials are scored on a temporal fold (train on earlier months, validate on the
+    last one) with XGBoost early stopping on that fold, and each rung runs in parallel.
+    Cost is trees × depth, i.e. traversal steps per predicted row. The tuned model is
+    compiled here (``compact``/``report``): its name alone does not identify it.
+    """
+    from joblib import Parallel, delayed
+    from sklearn.model_selection import train_test_split
+
+    X, y, _ = _global_design(_df)
+    last = _df["Bulan_Index"].to_numpy() == _df["Bulan_Index"].max()
+    X_tr, y_tr, X_val, y_val = X[~last], y[~last], X[last], y[last]
+
+    rng = np.random.default_rng(42)
+    families = list(SEARCH_SPACE)
+    n_distinct = sum(math.prod(len(v) for v in space.values()) for space in SEARCH_SPACE.values())
+
+    def sample(k):
+        """``k`` distinct configs (fewer if the space is smaller), family first, then each parameter."""
+        configs = []
+        while len(configs) < min(k, n_distinct):
+            family = families[rng.integers(len(families))]
+            config = family, {p: v[rng.integers(len(v))] for p, v in SEARCH_SPACE[family].items()}
+            if config not in configs:
+                configs.append(config)
+        return configs
+
+    s_max = int(math.log(max_estimators / min_estimators, eta))
+    log, start = [], time.perf_counter()
+    for s in range(s_max, -1, -1):
+        configs = sample(math.ceil((s_max + 1) / (s + 1) * eta ** s))
+        for i in range(s + 1):
+            if time.perf_counter() - start > time_budget:
+                break
+            n_est = int(max_estimators * eta ** (i - s))
+            trials = Parallel(n_jobs=-1, prefer="threads")(
+                delayed(_run_trial)(fam, params, n_est, X_tr, y_tr, X_val, y_val) for fam, params in configs
+            )
+            for trial in trials:
+                trial.update({"Bracket": s, "Rung": i})
+            log.extend(trials)
+            order = np.argsort([t["MAPE (%)"] for t in trials])
+            configs = [configs[j] for j in order[:max(1, len(configs) // eta)]]
+
+    log_df = pd.DataFrame(log)
+    best_mape = log_df["MAPE (%)"].min()
+    within = log_df[log_df["MAPE (%)"] <= best_mape * (1 + tolerance)]
+    chosen = within.sort_values(["Cost", "MAPE (%)"]).iloc[0]
+    params = {k: chosen[k] for k in SEARCH_SPACE[chosen["Model"]]}
+    params = {k: (int(v) if k == "max_depth" else float(v)) for k, v in params.items()}
+
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    model = _make_global_model(chosen["Model"], params, int(chosen["n_used"]))
+    result = _score_global(model, X, y, X_train, X_test, y_train, y_test)
+    compact, report = _compile_global({"tuned": result}, "tuned")
+    return {
+        "log": log_df, "chosen": chosen, "result": result, "compact": compact, "report": report,
+        "best_mape": best_mape,
+        "tolerance": tolerance, "elapsed": time.perf_counter() - start,
+    }
+
+
+def _compile_global(global_results, best_name):
+    """Compile the chosen global model to flat node arrays and check parity on its test split."""
+    res = global_results[best_name]
+    compact = compile_model(res["model"])
+    return compact, compare_compact(res["model"], compact, res["X_test"], res["y_test"])
+
+
+# ── Background global training ──────────────────────────────────────────────
+def data_fingerprint(df):
+    """sha1 of the training rows (Product_Key, Bulan, Harga)."""
+    h = hashlib.sha1(pd.util.hash_pandas_object(df[["Product_Key", "Bulan", "Harga"]], index=False).to_numpy())
+    return h.hexdigest()
+
+
+def _bundle_key(df):
+    """Cache key of the global bundle: the data, ``MODEL_CACHE_VERSION`` and the sklearn/xgboost versions."""
+    from importlib.metadata import version
+
+    tag = f"{data_fingerprint(df)}|{MODEL_CACHE_VERSION}|{version('scikit-learn')}|{version('xgboost')}"
+    return hashlib.sha1(tag.encode()).hexdigest()
+
+
+def _global_bundle(df, directory):
+    """Trained global models plus the compiled best one, from the on-disk cache when data and code are unchanged."""
+    path = os.path.join(directory, f"global_models_{_bundle_key(df)[:16]}.pkl")
+    if os.path.exists(path):
+        try:
+            with open(path, "rb") as f:
+                return pickle.load(f)
+        except Exception:
+            # Unreadable (e.g. written by other library versions): retrain and overwrite below
+            pass
+    results, best_name, features = _train_global_models(df)
+    compact, report = _compile_global(results, best_name)
+    bundle = {"results": results, "best": best_name, "features": features, "compact": compact, "report": report}
+    os.makedirs(directory, exist_ok=True)
+    for p in glob.glob(os.path.join(directory, "global_models_*.pkl")):
+        os.remove(p)
+    # Write-then-rename so a concurrent reader never sees a partial pickle
+    with open(path + ".tmp", "wb") as f:
+        pickle.dump(bundle, f)
+    os.replace(path + ".tmp", path)
+    return bundle
+
+
+@st.cache_resource
+def start_global_training(_df, directory=MODEL_CACHE_DIR):
+    """Train (or load) the global models on a background thread; returns a ``Future`` of the bundle.
+
+    The bundle is a dict with ``results``/``best``/``features`` as returned by
+    ``_train_global_models`` plus ``compact``/``report`` from ``_compile_global``.
+    """
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="global-models")
+    future = executor.submit(_global_bundle, _df, directory)
+    executor.shutdown(wait=False)
+    return future
+
+
+@st.cache_resource
 def evaluate_per_product(_df):
     """Leave-last-out evaluation per product."""
+    return _evaluate_per_product(_df)
+
+
+def _evaluate_per_product(_df):
     errors = []
     for pk, grp in _df.groupby("Product_Key"):
         grp = grp.sort_values("Bulan")
@@ -110,12 +321,783 @@ def evaluate_per_product(_df):
             continue
         X_t = grp["Bulan_Index"].values
         y_t = grp["Harga"].values
-        lr = LinearRegression()
-        lr.fit(X_t[:-1].reshape(-1, 1), y_t[:-1])
-        pred = lr.predict([[X_t[-1]]])[0]
+        slope, intercept = _line_fit(X_t[:-1], y_t[:-1])
+        pred = intercept + slope * X_t[-1]
         actual = y_t[-1]
         errors.append({
             "Product": pk, "Actual": actual, "Predicted": pred,
             "Error": pred - actual, "APE": abs(pred - actual) / actual * 100,
         })
     return pd.DataFrame(errors)
+
+
+# ── Hierarchical pooled trend (empirical Bayes) ─────────────────────────────
+HIER_LEVELS = ["Kondisi", "Generasi", "Variant_Normalized", "Storage"]
+
+
+def _group_sum(codes, values, n):
+    return np.bincount(codes, weights=values, minlength=n)
+
+
+def fit_hierarchical_trend(df):
+    """Fit a log-linear trend per product with slopes shrunk along Kondisi→Generasi→Variant→Storage.
+
+    Every quantity is a grouped sum over integer codes, so the fit is closed form:
+    each node gets the pooled within-product slope of its descendants, then slopes are
+    shrunk top-down toward the parent with a method-of-moments between-node variance.
+    Levels (log price at the latest month) carry storage/variant/generation offsets so
+    that combinations missing from the data can be served from their nearest ancestor.
+    """
+    t = df["Bulan_Index"].to_numpy(dtype=float)
+    y = np.log(df["Harga"].to_numpy(dtype=float))
+    t_ref = float(t.max())
+
+    # Node codes per depth (1 = Kondisi … 4 = Product)
+    depth_codes, depth_index = [], []
+    codes = np.zeros(len(df), dtype=np.int64)
+    for d, col in enumerate(HIER_LEVELS, start=1):
+        col_codes, col_uniq = pd.factorize(df[col])
+        codes, _ = pd.factorize(codes * len(col_uniq) + col_codes)
+        first = np.zeros(codes.max() + 1, dtype=np.int64)
+        first[codes[::-1]] = np.arange(len(codes))[::-1]
+        depth_codes.append(codes)
+        depth_index.append(pd.MultiIndex.from_frame(df[HIER_LEVELS[:d]].iloc[first]))
+    key_codes, n_keys = depth_codes[-1], len(depth_index[-1])
+
+    # Per-product sufficient statistics
+    n = _group_sum(key_codes, np.ones_like(t), n_keys)
+    t_bar = _group_sum(key_codes, t, n_keys) / n
+    y_bar = _group_sum(key_codes, y, n_keys) / n
+    tc = t - t_bar[key_codes]
+    yc = y - y_bar[key_codes]
+    sxx = _group_sum(key_codes, tc * tc, n_keys)
+    sxy = _group_sum(key_codes, tc * yc, n_keys)
+    syy = _group_sum(key_codes, yc * yc, n_keys)
+
+    # Pooled residual variance from products with ≥ 3 points
+    ok = (n >= 3) & (sxx > 0)
+    b_raw = np.divide(sxy, sxx, out=np.zeros(n_keys), where=sxx > 0)
+    rss = syy - b_raw * sxy
+    dof = (n[ok] - 2).sum()
+    sigma2 = float(max(rss[ok].sum() / dof, 1e-8)) if dof > 0 else 1e-4
+
+    # Map each product to its ancestor node at every depth
+    first_row = np.zeros(n_keys, dtype=np.int64)
+    first_row[key_codes[::-1]] = np.arange(len(key_codes))[::-1]
+    key_parent = [codes[first_row] for codes in depth_codes]
+
+    # Top-down shrinkage of slopes
+    total_sxx = sxx.sum()
+    slope = sxy.sum() / total_sxx if total_sxx > 0 else 0.0
+    post = np.array([slope])
+    node_slopes, node_tau2 = [], []
+    for d in range(len(HIER_LEVELS)):
+        n_nodes = len(depth_index[d])
+        node_sxx = _group_sum(key_parent[d], sxx, n_nodes)
+        node_sxy = _group_sum(key_parent[d], sxy, n_nodes)
+        node_parent = np.zeros(n_nodes, dtype=np.int64)
+        if d > 0:
+            node_parent[key_parent[d]] = key_parent[d - 1]
+        prior = post[node_parent]
+        has = node_sxx > 0
+        b = np.divide(node_sxy, node_sxx, out=prior.copy(), where=has)
+        se2 = np.divide(sigma2, node_sxx, out=np.full(n_nodes, np.inf), where=has)
+        tau2 = float(max(np.mean((b[has] - prior[has]) ** 2 - se2[has]), 1e-8)) if has.any() else 1e-8
+        w = tau2 / (tau2 + se2)
+        post = w * b + (1 - w) * prior
+        node_slopes.append(post)
+        node_tau2.append(tau2)
+
+    # Levels at t_ref with storage / variant / generation offsets
+    key_slope = node_slopes[-1]
+    m = y_bar + key_slope * (t_ref - t_bar)
+    key_frame = depth_index[-1].to_frame(index=False)
+    ls = np.log2(key_frame["Storage"].to_numpy(dtype=float))
+
+    kgv = key_parent[2]
+    n_kgv = len(depth_index[2])
+    cnt = np.bincount(kgv, minlength=n_kgv)
+    dm = m - (_group_sum(kgv, m, n_kgv) / cnt)[kgv]
+    ds = ls - (_group_sum(kgv, ls, n_kgv) / cnt)[kgv]
+    gamma = float((dm * ds).sum() / (ds * ds).sum()) if (ds * ds).sum() > 0 else 0.0
+    m_adj = m - gamma * ls
+
+    def _offsets(parent, col, values):
+        n_par = parent.max() + 1
+        cnt_par = np.bincount(parent, minlength=n_par)
+        resid = values - (_group_sum(parent, values, n_par) / cnt_par)[parent]
+        return pd.Series(resid).groupby(key_frame[col].to_numpy()).mean()
+
+    variant_eff = _offsets(key_parent[1], "Variant_Normalized", m_adj)
+    m_adj2 = m_adj - variant_eff.reindex(key_frame["Variant_Normalized"]).to_numpy()
+    gen_eff = _offsets(key_parent[0], "Generasi", m_adj2)
+    m_adj3 = m_adj2 - gen_eff.reindex(key_frame["Generasi"]).to_numpy()
+
+    node_levels, level_var = [], []
+    for d, adj in zip(range(len(HIER_LEVELS)), [m_adj3, m_adj2, m_adj, m]):
+        n_nodes = len(depth_index[d])
+        lvl = _group_sum(key_parent[d], adj, n_nodes) / np.bincount(key_parent[d], minlength=n_nodes)
+        node_levels.append(lvl)
+        level_var.append(float(np.mean((adj - lvl[key_parent[d]]) ** 2)))
+
+    return {
+        "index": depth_index,
+        "slope": node_slopes,
+        "level": node_levels,
+        "tau2": node_tau2,
+        "level_var": level_var,
+        "sigma2": sigma2,
+        "gamma": gamma,
+        "variant_eff": variant_eff,
+        "gen_eff": gen_eff,
+        "t_ref": t_ref,
+        "n_points": n,
+    }
+
+
+def predict_hierarchical(hier, query, bulan_index):
+    """Predict prices for a frame with Kondisi/Generasi/Variant_Normalized/Storage columns.
+
+    Returns ``(price, depth)`` arrays; ``depth`` is the deepest matched level
+    (4 = exact product, 0 = no match, price NaN).
+    """
+    n_q = len(query)
+    t = np.broadcast_to(np.asarray(bulan_index, dtype=float), (n_q,))
+    level = np.full(n_q, np.nan)
+    slope = np.full(n_q, np.nan)
+    depth = np.zeros(n_q, dtype=int)
+    for d in range(len(HIER_LEVELS)):
+        idx = hier["index"][d].get_indexer(pd.MultiIndex.from_frame(query[HIER_LEVELS[:d + 1]]))
+        hit = idx >= 0
+        level[hit] = hier["level"][d][idx[hit]]
+        slope[hit] = hier["slope"][d][idx[hit]]
+        depth[hit] = d + 1
+
+    ls = np.log2(query["Storage"].to_numpy(dtype=float))
+    v_eff = hier["variant_eff"].reindex(query["Variant_Normalized"]).fillna(0).to_numpy()
+    g_eff = hier["gen_eff"].reindex(query["Generasi"]).fillna(0).to_numpy()
+    level = level + np.where(depth < 4, hier["gamma"] * ls, 0)
+    level = level + np.where(depth < 3, v_eff, 0) + np.where(depth < 2, g_eff, 0)
+    price = np.exp(level + slope * (t - hier["t_ref"]))
+    return price, depth
+
+
+@st.cache_resource
+def build_hierarchical_model(_df):
+    """Cached hierarchical pooled trend model."""
+    return fit_hierarchical_trend(_df)
+
+
+@st.cache_resource
+def benchmark_hierarchical(_df):
+    """Leave-last-out accuracy and fit time: hierarchical pooled vs per-product linear."""
+    start = time.perf_counter()
+    pp_eval = _evaluate_per_product(_df)
+    pp_time = time.perf_counter() - start
+
+    # Same hold-out as evaluate_per_product: last month of every product with ≥ 3 points
+    ordered = _df.sort_values(["Product_Key", "Bulan"], kind="stable")
+    size = ordered.groupby("Product_Key")["Harga"].transform("size")
+    is_last = ~ordered["Product_Key"].duplicated(keep="last")
+    holdout = is_last & (size >= 3)
+
+    start = time.perf_counter()
+    hier = fit_hierarchical_trend(ordered[~holdout])
+    test = ordered[holdout]
+    pred, _ = predict_hierarchical(hier, test, test["Bulan_Index"].to_numpy())
+    hier_time = time.perf_counter() - start
+
+    actual = test["Harga"].to_numpy(dtype=float)
+    hier_eval = pd.DataFrame({
+        "Product": test["Product_Key"].to_numpy(), "Actual": actual, "Predicted": pred,
+        "Error": pred - actual, "APE": np.abs(pred - actual) / actual * 100,
+    })
+    return {
+        "Per-Produk (Linear)": {"mape": pp_eval["APE"].mean(), "mae": pp_eval["Error"].abs().mean(),
+                                "fit_seconds": pp_time, "n_eval": len(pp_eval)},
+        "Hierarchical (Pooled)": {"mape": hier_eval["APE"].mean(), "mae": hier_eval["Error"].abs().mean(),
+                                  "fit_seconds": hier_time, "n_eval": len(hier_eval)},
+    }
+
+
+# ── Batch trend fitting (OLS / Theil–Sen / Huber) ───────────────────────────
+TREND_MODES = {
+    "ols": "OLS (Least Squares)", "theil_sen": "Theil–Sen", "huber": "Huber IRLS",
+    "changepoint": "Change-Point (Piecewise)",
+}
+
+
+def pad_products(df, with_month=False):
+    """Per-product (Bulan_Index, Harga) histories as NaN-padded (n_keys × max_len) arrays.
+
+    With ``with_month`` a third array holds ``Bulan_Num`` (0 in padding).
+    """
+    ordered = df.sort_values(["Product_Key", "Bulan"], kind="stable")
+    codes, keys = pd.factorize(ordered["Product_Key"])
+    pos = ordered.groupby(codes).cumcount().to_numpy()
+    T = np.full((len(keys), pos.max() + 1), np.nan)
+    Y = np.full_like(T, np.nan)
+    T[codes, pos] = ordered["Bulan_Index"].to_numpy(dtype=float)
+    Y[codes, pos] = ordered["Harga"].to_numpy(dtype=float)
+    if with_month:
+        M = np.zeros(T.shape, dtype=int)
+        M[codes, pos] = ordered["Bulan_Num"].to_numpy()
+        return pd.Index(keys, name="Product_Key"), T, Y, M
+    return pd.Index(keys, name="Product_Key"), T, Y
+
+
+def _weighted_line(T, Y, W):
+    sw = W.sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t_bar = np.nansum(W * T, axis=1) / sw
+        y_bar = np.nansum(W * Y, axis=1) / sw
+        tc = T - t_bar[:, None]
+        sxx = np.nansum(W * tc * tc, axis=1)
+        slope = np.where(sxx > 0, np.nansum(W * tc * (Y - y_bar[:, None]), axis=1) / sxx, 0.0)
+    return slope, y_bar - slope * t_bar
+
+
+def _row_median(A):
+    """Row-wise median ignoring NaN (NaN for empty rows); sort-based, faster than ``np.nanmedian``."""
+    n = (~np.isnan(A)).sum(axis=1)
+    srt = np.sort(A, axis=1)
+    rows = np.arange(len(A))
+    lo = srt[rows, np.maximum((n - 1) // 2, 0)]
+    hi = srt[rows, np.maximum(n // 2, 0)]
+    return np.where(n > 0, (lo + hi) / 2, np.nan)
+
+
+def fit_trend_batch(T, Y, mode="ols", huber_c=1.345, n_iter=20, tol=1e-6):
+    """Slope and intercept for every padded row at once.
+
+    ``theil_sen`` takes the median of all pairwise slopes (histories are short, so the
+    L × L pair tensor is cheap) and the median of ``y - slope·t`` as intercept;
+    ``huber`` runs IRLS from the OLS fit with a per-product MAD scale.
+    ``changepoint`` is fitted by ``fit_changepoint_batch`` (it needs the launch months).
+    """
+    valid = ~np.isnan(Y)
+    W = valid.astype(float)
+    if mode == "ols":
+        return _weighted_line(T, Y, W)
+    if mode == "theil_sen":
+        dT = T[:, None, :] - T[:, :, None]
+        dY = Y[:, None, :] - Y[:, :, None]
+        upper = np.triu(np.ones(dT.shape[1:], dtype=bool), k=1)
+        ok = upper & (dT != 0) & ~np.isnan(dT) & ~np.isnan(dY)
+        pair = np.where(ok, dY / np.where(ok, dT, 1.0), np.nan).reshape(len(T), -1)
+        slope = np.nan_to_num(_row_median(pair))
+        intercept = _row_median(Y - slope[:, None] * T)
+        return slope, intercept
+    if mode == "huber":
+        slope, intercept = _weighted_line(T, Y, W)
+        ref = np.nanmean(np.abs(Y), axis=1)
+        active = np.arange(len(T))
+        for _ in range(n_iter):
+            Ta, Ya, va = T[active], Y[active], valid[active]
+            r = np.where(va, Ya - intercept[active, None] - slope[active, None] * Ta, np.nan)
+            scale = np.maximum(1.4826 * _row_median(np.abs(r)), 1e-6 * ref[active])[:, None]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                W = np.where(va, np.minimum(1.0, huber_c * scale / np.abs(r)), 0.0)
+            b, a = _weighted_line(Ta, Ya, W)
+            # Converged rows drop out of later iterations
+            moved = np.maximum(np.abs(b - slope[active]) * np.nanmax(np.abs(Ta), axis=1),
+                               np.abs(a - intercept[active])) > tol * ref[active]
+            slope[active], intercept[active] = b, a
+            active = active[moved]
+            if not len(active):
+                break
+        return slope, intercept
+    raise ValueError(f"Mode trend tidak dikenal: {mode}")
+
+
+# ── Change-point trend engine ───────────────────────────────────────────────
+# A break needs this many points on each side (one more after it for a slope change,
+# so the forecasting segment's slope never rests on two points). It is kept when its
+# F-test against the single line is significant at CP_ALPHA after a Bonferroni
+# correction over the candidates tried; residuals are floored at CP_RSS_FLOOR × mean
+# price so exact fits on tiny segments do not look infinitely significant.
+CP_MIN_SEGMENT = 2
+CP_ALPHA = 0.05
+CP_RSS_FLOOR = 1e-3
+
+
+def launch_points(df):
+    """Bulan_Index of months where a new generation appears (the max Gen_Num rises), or None."""
+    latest = df.groupby("Bulan_Index")["Gen_Num"].max().sort_index()
+    launches = latest.index[latest > latest.cummax().shift()].to_numpy(dtype=float)
+    return launches if len(launches) else None
+
+
+def _batched_wls(X, Y, W):
+    """Weighted least squares for a stack of problems: X (K, L, p), Y and W (K, L)."""
+    on = W > 0
+    Xz = np.where(on[..., None], X, 0.0)
+    Yz = np.where(on, Y, 0.0)
+    XtX = np.einsum("klp,kl,klq->kpq", Xz, W, Xz)
+    Xty = np.einsum("klp,kl,kl->kp", Xz, W, Yz)
+    # A tiny ridge keeps rows too short to identify every term solvable
+    p = X.shape[-1]
+    ridge = (1e-9 * np.trace(XtX, axis1=1, axis2=2)[:, None, None] + 1e-12) * np.eye(p)
+    coef = np.linalg.solve(XtX + ridge, Xty[..., None])[..., 0]
+    fitted = np.einsum("klp,kp->kl", Xz, coef)
+    return coef, fitted, (W * (Yz - fitted) ** 2).sum(axis=1)
+
+
+def fit_changepoint_batch(T, Y, M=None, seasonal=False, candidates=None, alpha=CP_ALPHA, n_iter=3, shrink=5.0):
+    """Piecewise-linear trend with at most one change point per product, for all rows at once.
+
+    Candidate breaks ``c`` are ``candidates`` (e.g. ``launch_points``), or every
+    observed month after the first. Per candidate, two designs are
+    solved for all products in one batched least-squares call: a level shift
+    ``[1, t, t ≥ c]`` and a shift plus slope change ``[1, t, t ≥ c, (t − c)⁺]``.
+    Each product keeps the most significant break (nested F-test vs the single
+    line, Bonferroni over its eligible candidates), or the line if none passes.
+
+    With ``seasonal`` (needs ``M``, the Bulan_Num array), multiplicative
+    month-of-year factors pooled across products are fitted by alternating with
+    the trends; each factor is shrunk toward 0 by ``shrink`` pseudo-observations.
+
+    Returns a dict: ``slope``/``intercept`` of the last segment (the forecasting
+    line), ``pre_slope``/``pre_intercept`` of the segment before the break (the
+    single line without one), ``break_t`` (NaN without a break), ``n_params``,
+    ``fitted`` on the input grid and ``season`` (13 factors indexed by Bulan_Num,
+    index 0 unused).
+    """
+    from scipy import stats
+
+    valid = ~np.isnan(Y)
+    W = valid.astype(float)
+    n = W.sum(axis=1)
+    Tz = np.where(valid, T, 0.0)
+    ones = np.ones_like(Tz)
+    if candidates is None:
+        candidates = np.unique(T[valid])[1:]
+    floor = n * (CP_RSS_FLOOR * np.nanmean(Y, axis=1)) ** 2
+    months = np.where(valid, M, 0) if seasonal else None
+    season = np.zeros(13)
+
+    for _ in range(n_iter if seasonal else 1):
+        Ya = Y / (1 + season[months]) if seasonal else Y
+        slope, intercept = _weighted_line(T, Ya, W)
+        fitted = intercept[:, None] + slope[:, None] * Tz
+        rss0 = (W * np.where(valid, Ya - fitted, 0.0) ** 2).sum(axis=1)
+        pre_slope, pre_intercept = slope, intercept
+        break_t = np.full(len(T), np.nan)
+        n_params = np.full(len(T), 2)
+
+        fits = []
+        for c in candidates:
+            step = (Tz >= c) & valid
+            after = step.sum(axis=1)
+            hinge = np.maximum(Tz - c, 0.0)
+            for X in (np.stack([ones, Tz, step], axis=-1), np.stack([ones, Tz, step, hinge], axis=-1)):
+                p = X.shape[-1]
+                eligible = (n - after >= CP_MIN_SEGMENT) & (after >= CP_MIN_SEGMENT + (p == 4)) & (n > p)
+                fits.append((c, p, eligible, *_batched_wls(X, Ya, W)))
+        n_tests = np.maximum(sum(f[2] for f in fits), 1)
+
+        best_p = np.full(len(T), alpha)
+        for c, p, eligible, c_coef, c_fitted, rss in fits:
+            with np.errstate(divide="ignore", invalid="ignore"):
+                F = ((rss0 - rss) / (p - 2)) / (np.maximum(rss, floor) / (n - p))
+                p_value = stats.f.sf(F, p - 2, n - p) * n_tests
+            better = eligible & (p_value < best_p)
+            d = c_coef[:, 3] if p == 4 else 0.0
+            best_p = np.where(better, p_value, best_p)
+            fitted = np.where(better[:, None], c_fitted, fitted)
+            slope = np.where(better, c_coef[:, 1] + d, slope)
+            intercept = np.where(better, c_coef[:, 0] + c_coef[:, 2] - d * c, intercept)
+            pre_slope = np.where(better, c_coef[:, 1], pre_slope)
+            pre_intercept = np.where(better, c_coef[:, 0], pre_intercept)
+            break_t = np.where(better, c, break_t)
+            n_params = np.where(better, p, n_params)
+
+        if seasonal:
+            with np.errstate(divide="ignore", invalid="ignore"):
+                rel = np.where(valid & (fitted > 0), Y / fitted - 1, 0.0)
+            count = np.bincount(months[valid], minlength=13)
+            season = np.bincount(months.ravel(), weights=rel.ravel(), minlength=13) / (count + shrink)
+            season[0] = 0.0
+
+    return {
+        "slope": slope, "intercept": intercept, "pre_slope": pre_slope, "pre_intercept": pre_intercept,
+        "break_t": break_t, "n_params": n_params,
+        "fitted": fitted * (1 + season[months]) if seasonal else fitted, "season": season,
+    }
+
+
+@st.cache_resource
+def evaluate_trend_modes(_df):
+    """Leave-last-out MAPE and fit time of each trend mode over all products with ≥ 3 points.
+
+    The change-point rows use the launch months as candidate breaks; "Change-Point +
+    Musiman" adds pooled month-of-year factors, applied at the held-out month.
+    """
+    _, T, Y, M = pad_products(_df, with_month=True)
+    n = (~np.isnan(Y)).sum(axis=1)
+    T, Y, M = T[n >= 3], Y[n >= 3], M[n >= 3]
+    last = n[n >= 3] - 1
+    rows = np.arange(len(T))
+    t_last, y_last, m_last = T[rows, last], Y[rows, last], M[rows, last]
+    T_tr, Y_tr = T.copy(), Y.copy()
+    T_tr[rows, last] = np.nan
+    Y_tr[rows, last] = np.nan
+
+    launches = launch_points(_df)
+    import scipy.stats  # noqa: F401 — the change-point F-test needs it; keep the import out of the timing
+
+    def changepoint_fit(seasonal):
+        fit = fit_changepoint_batch(T_tr, Y_tr, M, seasonal=seasonal, candidates=launches)
+        return fit["slope"], fit["intercept"], 1 + fit["season"][m_last]
+
+    fitters = {label: (lambda mode=mode: (*fit_trend_batch(T_tr, Y_tr, mode), 1.0))
+               for mode, label in TREND_MODES.items() if mode != "changepoint"}
+    fitters[TREND_MODES["changepoint"]] = lambda: changepoint_fit(False)
+    fitters["Change-Point + Musiman"] = lambda: changepoint_fit(True)
+
+    results = []
+    for label, fit in fitters.items():
+        start = time.perf_counter()
+        slope, intercept, factor = fit()
+        fit_seconds = time.perf_counter() - start
+        pred = (intercept + slope * t_last) * factor
+        results.append({
+            "Mode": label, "MAPE (%)": np.mean(np.abs(pred - y_last) / y_last) * 100,
+            "MAE (Rp)": np.mean(np.abs(pred - y_last)), "Waktu Fit (ms)": fit_seconds * 1000,
+            "Produk Dievaluasi": len(T),
+        })
+    return pd.DataFrame(results)
+
+
+# ── Prediction intervals ─────────────────────────────────────────────────────
+VARIANT_TIER = {"Mini": 1, "e": 2, "Basic": 3, "Air": 4, "Plus": 5, "Pro": 6, "Pro Max": 7}
+KONDISI_TIER = {"BC": 1, "Second": 2, "New": 3}
+DEPR_FACTOR = {"New": 0, "Second": -1, "BC": -2}
+
+
+@st.cache_resource
+def build_product_stats(_df, trend_mode="ols"):
+    """OLS sufficient statistics per product, computed in one grouped pass.
+
+    Slope/intercept match ``build_product_models``; ``resid_var`` is the unbiased
+    residual variance on ``dof`` degrees of freedom (NaN when n < 3), used for
+    t-based prediction intervals with the leverage terms ``n_line``/``t_bar``/``sxx``.
+    With a robust ``trend_mode`` the line comes from ``fit_trend_batch`` and
+    ``resid_var`` from its residuals; the interval formula is kept as is. For
+    ``changepoint`` the line is the last segment, the residuals and ``dof`` are those
+    of the piecewise fit, and the leverage terms are those of the forecasting
+    segment: its own points after a slope change, and, after a level shift alone,
+    its points for the level with the slope pooled within both segments. The
+    segment before a break gets the same columns with a ``pre_`` prefix, next to
+    ``break_t`` (all NaN for products without a break and in the other modes).
+    """
+    g = _df.assign(_t=_df["Bulan_Index"].astype(float), _y=_df["Harga"].astype(float))
+    g["_tt"] = g["_t"] * g["_t"]
+    g["_ty"] = g["_t"] * g["_y"]
+    g["_yy"] = g["_y"] * g["_y"]
+    sums = g.groupby("Product_Key")[["_t", "_y", "_tt", "_ty", "_yy"]].sum()
+    n = g.groupby("Product_Key").size().astype(float)
+
+    t_bar = sums["_t"] / n
+    y_bar = sums["_y"] / n
+    sxx = sums["_tt"] - n * t_bar ** 2
+    sxy = sums["_ty"] - n * t_bar * y_bar
+    syy = sums["_yy"] - n * y_bar ** 2
+    slope = (sxy / sxx).where(sxx > 0, 0.0)
+    intercept = y_bar - slope * t_bar
+    rss = (syy - slope * sxy).clip(lower=0)
+    dof = n - 2
+    n_line = n
+    pre_cols = ["break_t", "pre_slope", "pre_intercept", "pre_n", "pre_t_bar", "pre_sxx"]
+    pre_stats = {col: pd.Series(np.nan, index=n.index) for col in pre_cols}
+    if trend_mode == "changepoint":
+        keys, T, Y = pad_products(_df)
+        fit = fit_changepoint_batch(T, Y, candidates=launch_points(_df))
+        slope = pd.Series(fit["slope"], index=keys).reindex(n.index)
+        intercept = pd.Series(fit["intercept"], index=keys).reindex(n.index)
+        rss = pd.Series(np.nansum((Y - fit["fitted"]) ** 2, axis=1), index=keys).reindex(n.index)
+        rss = rss.clip(lower=n * (CP_RSS_FLOOR * y_bar) ** 2)
+        dof = n - pd.Series(fit["n_params"], index=keys).reindex(n.index)
+
+        # Leverage of the forecasting segment (the whole series without a break)
+        valid = ~np.isnan(Y)
+        seg = valid & ~(T < fit["break_t"][:, None])
+        pre = valid & ~seg
+
+        def seg_stats(mask):
+            cnt = mask.sum(axis=1)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                mean = np.where(mask, T, 0.0).sum(axis=1) / cnt
+            return cnt, mean, np.where(mask, (T - mean[:, None]) ** 2, 0.0).sum(axis=1)
+
+        n_seg, t_seg, sxx_seg = seg_stats(seg)
+        n_pre, t_pre, sxx_pre = seg_stats(pre)
+        shift_only = fit["n_params"] == 3
+        sxx_seg, sxx_pre = sxx_seg + np.where(shift_only, sxx_pre, 0.0), sxx_pre + np.where(shift_only, sxx_seg, 0.0)
+        n_line = pd.Series(n_seg, index=keys, dtype=float).reindex(n.index)
+        t_bar = pd.Series(t_seg, index=keys).reindex(n.index)
+        sxx = pd.Series(sxx_seg, index=keys).reindex(n.index)
+        has_break = ~np.isnan(fit["break_t"])
+        pre_values = [fit["break_t"], fit["pre_slope"], fit["pre_intercept"], n_pre.astype(float), t_pre, sxx_pre]
+        pre_stats = {col: pd.Series(np.where(has_break, v, np.nan), index=keys).reindex(n.index)
+                     for col, v in zip(pre_cols, pre_values)}
+    elif trend_mode != "ols":
+        keys, T, Y = pad_products(_df)
+        b, a = fit_trend_batch(T, Y, trend_mode)
+        slope = pd.Series(b, index=keys).reindex(n.index)
+        intercept = pd.Series(a, index=keys).reindex(n.index)
+        rss = pd.Series(np.nansum((Y - a[:, None] - b[:, None] * T) ** 2, axis=1), index=keys).reindex(n.index)
+    return pd.DataFrame({
+        "n": n, "n_line": n_line, "t_bar": t_bar, "sxx": sxx, "slope": slope,
+        "intercept": intercept, "dof": dof,
+        "resid_var": (rss / dof).where((n > 2) & (dof > 0)), **pre_stats,
+    })
+
+
+# Weight of the pooled residual variance, in residual degrees of freedom
+POOLED_VAR_DOF = 4
+
+
+def predict_product_intervals(product_stats, keys, bulan_index, level=0.9, hier=None):
+    """Vectorized OLS prediction intervals for any number of (key, month) pairs.
+
+    ``keys`` and ``bulan_index`` broadcast against each other. Returns a frame with
+    Predicted/Lower/Upper; rows whose product has fewer than 3 points are NaN. With
+    ``hier``, each residual variance is shrunk toward the pooled one (``hier["sigma2"]``
+    at the product's mean price) with weight ``POOLED_VAR_DOF``, which also adds to the
+    t dof, so a 3-point product no longer gets a t quantile on 1 dof.
+    """
+    from scipy import stats
+
+    keys, t = np.broadcast_arrays(np.asarray(keys, dtype=object), np.asarray(bulan_index, dtype=float))
+    st_ = product_stats.reindex(keys.ravel())
+    t = t.ravel()
+    n = st_["n"].to_numpy()
+    dof = st_["dof"].to_numpy()
+    pred = st_["intercept"].to_numpy() + st_["slope"].to_numpy() * t
+    resid_var = st_["resid_var"].to_numpy()
+    if hier is not None:
+        mean_price = st_["intercept"].to_numpy() + st_["slope"].to_numpy() * st_["t_bar"].to_numpy()
+        pooled = hier["sigma2"] * mean_price ** 2
+        # A fit with no residual dof (e.g. a 4-point change-point fit) falls back to the pooled variance
+        resid_var = (np.where(dof > 0, dof * resid_var, 0) + POOLED_VAR_DOF * pooled) / (np.maximum(dof, 0) + POOLED_VAR_DOF)
+        dof = np.maximum(dof, 0) + POOLED_VAR_DOF
+    with np.errstate(divide="ignore", invalid="ignore"):
+        se = np.sqrt(resid_var
+                     * (1 + 1 / st_["n_line"].to_numpy() + (t - st_["t_bar"].to_numpy()) ** 2 / st_["sxx"].to_numpy()))
+    q = stats.t.ppf(0.5 + level / 2, np.where((n > 2) & (dof > 0), dof, np.nan))
+    pred = np.where(n > 2, pred, np.nan)
+    return pd.DataFrame({
+        "Predicted": np.maximum(pred, 0),
+        "Lower": np.maximum(pred - q * se, 0),
+        "Upper": pred + q * se,
+    })
+
+
+def hierarchical_interval(hier, query, bulan_index, price, depth, level=0.9):
+    """Log-normal interval around a hierarchical prediction.
+
+    Variance = pooled residual variance (shrinking with the product's own points),
+    plus the spread of product levels around the matched node (zero for an exact
+    product) and the slope uncertainty of that level times the horizon squared.
+    """
+    from scipy import stats
+
+    n_q = len(query)
+    t = np.broadcast_to(np.asarray(bulan_index, dtype=float), (n_q,))
+    key_idx = hier["index"][-1].get_indexer(pd.MultiIndex.from_frame(query[HIER_LEVELS]))
+    n = np.where(key_idx >= 0, hier["n_points"][np.maximum(key_idx, 0)], 1.0)
+    d = np.maximum(depth, 1) - 1
+    var = (hier["sigma2"] * (1 + 1 / n) + np.array(hier["level_var"])[d]
+           + np.array(hier["tau2"])[d] * (t - hier["t_ref"]) ** 2)
+    z = stats.norm.ppf(0.5 + level / 2)
+    return price * np.exp(-z * np.sqrt(var)), price * np.exp(z * np.sqrt(var))
+
+
+def conformal_interval(global_result, pred, level=0.9):
+    """Split-conformal interval from the held-out relative residuals of a global model."""
+    rel = np.abs(global_result["y_test"] - global_result["y_pred"]) / np.abs(global_result["y_pred"])
+    n = len(rel)
+    q = np.quantile(rel, min(np.ceil((n + 1) * level) / n, 1.0))
+    pred = np.asarray(pred, dtype=float)
+    return np.maximum(pred * (1 - q), 0), pred * (1 + q)
+
+
+def global_feature_matrix(query, bulan_index, max_gen):
+    """Feature matrix in ``_train_global_models`` order for a query frame."""
+    t = np.broadcast_to(np.asarray(bulan_index, dtype=float), (len(query),))
+    kt = query["Kondisi"].map(KONDISI_TIER).to_numpy(dtype=float)
+    gen_num = query["Generasi"].str.extract(r"(\d+)", expand=False).astype(int).to_numpy()
+    gen_age = max_gen - gen_num
+    return np.column_stack([
+        kt, gen_num, query["Variant_Normalized"].map(VARIANT_TIER).fillna(3).to_numpy(dtype=float),
+        np.log2(query["Storage"].to_numpy(dtype=float)), t, kt * t,
+        query["Kondisi"].map(DEPR_FACTOR).to_numpy(dtype=float) * t, gen_age, gen_age * t,
+    ])
+
+
+def predict_batch(product_stats, hier, query, bulan_index, level=0.9, global_result=None, max_gen=None,
+                  ladder=None):
+    """Predict with intervals for every row of ``query`` without refitting anything.
+
+    Per-product OLS is used for products with ≥ 3 points, the hierarchical pooled model
+    otherwise, the price ``ladder`` (if given) ahead of the hierarchy's ancestor levels
+    for combinations missing from the data, and ``global_result`` (if given) for rows
+    neither can place.
+    """
+    n_q = len(query)
+    t = np.broadcast_to(np.asarray(bulan_index, dtype=float), (n_q,))
+    keys = (query["Kondisi"] + "|" + query["Generasi"] + "|" +
+            query["Variant_Normalized"] + "|" + query["Storage"].astype(str)).to_numpy()
+    out = predict_product_intervals(product_stats, keys, t, level, hier)
+    out["Metode"] = np.where(out["Predicted"].notna(), "Per-Produk", None)
+
+    price, depth = predict_hierarchical(hier, query, t)
+    lo, hi = hierarchical_interval(hier, query, t, price, depth, level)
+    use_hier = out["Predicted"].isna().to_numpy() & (depth > 0)
+    out.loc[use_hier, ["Predicted", "Lower", "Upper"]] = np.column_stack([price, lo, hi])[use_hier]
+    out.loc[use_hier, "Metode"] = "Hierarchical"
+
+    if ladder is not None:
+        l_price, on_ladder = predict_ladder(ladder, query, t)
+        use_ladder = use_hier & (depth < 4) & on_ladder
+        # The ancestor's interval, moved to the ladder price
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ratio = l_price / price
+        out.loc[use_ladder, ["Predicted", "Lower", "Upper"]] = np.column_stack(
+            [l_price, lo * ratio, hi * ratio])[use_ladder]
+        out.loc[use_ladder, "Metode"] = "Ladder"
+
+    rest = out["Predicted"].isna().to_numpy()
+    if global_result is not None and rest.any():
+        g_pred = np.maximum(global_result["model"].predict(global_feature_matrix(query[rest], t[rest], max_gen)), 0)
+        g_lo, g_hi = conformal_interval(global_result, g_pred, level)
+        out.loc[rest, ["Predicted", "Lower", "Upper"]] = np.column_stack([g_pred, g_lo, g_hi])
+        out.loc[rest, "Metode"] = "Global"
+    return out
+
+
+# ── Price ladder (Storage/Variant interpolation) ────────────────────────────
+LADDER_HORIZON = 60
+# Rungs share one sortable key: (node × 16 + variant tier) × 16 + log2 storage
+_TIER_SLOTS = 16
+_STORAGE_SLOTS = 16
+
+
+def _rung_key(node, tier, ls):
+    return (np.asarray(node, dtype=float) * _TIER_SLOTS + tier) * _STORAGE_SLOTS + ls
+
+
+def fit_price_ladder(df, product_stats, hier, bulan_index=None):
+    """Ordered Storage/Variant price steps per (Kondisi, Generasi, Bulan).
+
+    Every product in the data is a rung, sorted by Kondisi+Generasi node, Variant tier
+    and Storage under one composite key, so queries are placed with ``np.searchsorted``.
+    A rung holds the log price ``predict_batch`` serves for that product (its own trend
+    with ≥ 3 points, else the hierarchical model; no intervals, so no scipy) at every
+    month of ``bulan_index`` (default: the data start to ``LADDER_HORIZON`` months past
+    its end). Within a variant the storage steps are made non-decreasing.
+    """
+    products = df[HIER_LEVELS].drop_duplicates()
+    node = hier["index"][1].get_indexer(pd.MultiIndex.from_frame(products[HIER_LEVELS[:2]]))
+    tier = products["Variant_Normalized"].map(VARIANT_TIER).fillna(3).to_numpy(dtype=float)
+    ls = np.log2(products["Storage"].to_numpy(dtype=float))
+    key = _rung_key(node, tier, ls)
+    order = np.argsort(key, kind="stable")
+    products = products.iloc[order].reset_index(drop=True)
+    node, tier, ls, key = node[order], tier[order], ls[order], key[order]
+
+    if bulan_index is None:
+        bulan_index = np.arange(0, df["Bulan_Index"].max() + LADDER_HORIZON + 1)
+    t = np.asarray(bulan_index, dtype=float)
+    n, m = len(products), len(t)
+    query = products.loc[np.repeat(np.arange(n), m)].reset_index(drop=True)
+    tt = np.tile(t, n)
+    st_ = product_stats.reindex(query["Kondisi"] + "|" + query["Generasi"] + "|" +
+                                query["Variant_Normalized"] + "|" + query["Storage"].astype(str))
+    own = st_["intercept"].to_numpy() + st_["slope"].to_numpy() * tt
+    price = np.where(st_["n"].to_numpy() > 2, own, predict_hierarchical(hier, query, tt)[0])
+    log_price = pd.DataFrame(np.log(np.maximum(price, 1.0)).reshape(n, m))
+    values = log_price.groupby(pd.factorize(_rung_key(node, tier, 0))[0]).cummax().to_numpy()
+    return {
+        "key": key, "node": node, "tier": tier, "ls": ls,
+        "variant": products["Variant_Normalized"].to_numpy(),
+        "t": t, "values": values,
+        "node_index": hier["index"][1], "node_slope": hier["slope"][1],
+        "gamma": hier["gamma"], "variant_eff": hier["variant_eff"],
+    }
+
+
+def _ladder_storage(ladder, node, tier, ls, col):
+    """Log price at log2 storage ``ls`` on variant ``tier`` of ``node`` in month column ``col``.
+
+    Interpolated between the neighbouring storages; past either end, extended with the
+    variant's outer step (the pooled storage effect for a single rung), floored at zero
+    so a larger storage is never cheaper. NaN where the variant has no rungs.
+    """
+    key, rung_ls, values = ladder["key"], ladder["ls"], ladder["values"]
+    last = len(key) - 1
+    lo = np.searchsorted(key, _rung_key(node, tier, 0))
+    hi = np.searchsorted(key, _rung_key(node, tier + 1, 0))
+    p = np.searchsorted(key, _rung_key(node, tier, ls))
+    has_b, has_a = p - 1 >= lo, p < hi
+    b, a = np.clip(p - 1, 0, last), np.clip(p, 0, last)
+    bb, aa = np.clip(p - 2, 0, last), np.clip(p + 1, 0, last)
+    v_b, v_a = values[b, col], values[a, col]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        w = (ls - rung_ls[b]) / (rung_ls[a] - rung_ls[b])
+        up = np.where(p - 2 >= lo, (v_b - values[bb, col]) / (rung_ls[b] - rung_ls[bb]), ladder["gamma"])
+        down = np.where(p + 1 < hi, (values[aa, col] - v_a) / (rung_ls[aa] - rung_ls[a]), ladder["gamma"])
+        out = np.where(has_b & has_a, v_b + w * (v_a - v_b),
+                       np.where(has_b, v_b + np.maximum(up, 0) * (ls - rung_ls[b]),
+                                v_a - np.maximum(down, 0) * (rung_ls[a] - ls)))
+    return np.where(hi > lo, out, np.nan)
+
+
+def predict_ladder(ladder, query, bulan_index):
+    """Ladder prices for a query frame; returns ``(price, found)``.
+
+    A variant with rungs in the node is priced along its storages; a variant without
+    is priced at the same storage on the neighbouring tiers and interpolated by tier,
+    or shifted by the pooled variant offset past the ends (never crossing the
+    neighbour). Months off the ladder drift from the nearest earlier ladder month
+    (the first for earlier ones) with the node's slope. ``found`` is False, and the
+    price NaN, where the Kondisi+Generasi node has no rungs.
+    """
+    n_q = len(query)
+    t = np.broadcast_to(np.asarray(bulan_index, dtype=float), (n_q,))
+    node = ladder["node_index"].get_indexer(pd.MultiIndex.from_frame(query[HIER_LEVELS[:2]]))
+    tier = query["Variant_Normalized"].map(VARIANT_TIER).fillna(3).to_numpy(dtype=float)
+    ls = np.log2(query["Storage"].to_numpy(dtype=float))
+    col = np.clip(np.searchsorted(ladder["t"], t, side="right") - 1, 0, len(ladder["t"]) - 1)
+    drift = np.where(node >= 0, ladder["node_slope"][np.maximum(node, 0)], 0.0) * (t - ladder["t"][col])
+    value = _ladder_storage(ladder, node, tier, ls, col)
+
+    # Neighbouring tiers: the rungs just before and after where the variant would sit
+    key, rung_node, rung_tier = ladder["key"], ladder["node"], ladder["tier"]
+    last = len(key) - 1
+    lo = np.searchsorted(key, _rung_key(node, tier, 0))
+    hi = np.searchsorted(key, _rung_key(node, tier + 1, 0))
+    below, above = np.clip(lo - 1, 0, last), np.clip(hi, 0, last)
+    has_b = (lo > 0) & (rung_node[below] == node)
+    has_a = (hi <= last) & (rung_node[above] == node)
+    t_b, t_a = rung_tier[below], rung_tier[above]
+    v_b = _ladder_storage(ladder, node, t_b, ls, col)
+    v_a = _ladder_storage(ladder, node, t_a, ls, col)
+    eff = ladder["variant_eff"]
+    e_q = eff.reindex(query["Variant_Normalized"]).fillna(0).to_numpy()
+    e_b = eff.reindex(ladder["variant"][below]).fillna(0).to_numpy()
+    e_a = eff.reindex(ladder["variant"][above]).fillna(0).to_numpy()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        inside = v_b + (v_a - v_b) * (tier - t_b) / (t_a - t_b)
+    by_tier = np.where(has_b & has_a, inside,
+                       np.where(has_b, v_b + np.maximum(e_q - e_b, 0), v_a - np.maximum(e_a - e_q, 0)))
+    value = np.where(np.isnan(value) & (has_b | has_a), by_tier, value)
+    found = (node >= 0) & ~np.isnan(value)
+    return np.exp(value + drift), found
+
+
+@st.cache_resource
+def build_price_ladder(_df, _product_stats, _hier, trend_mode="ols"):
+    """Cached price ladder; ``trend_mode`` keys the cache since ``_product_stats`` is not hashed."""
+    return fit_price_ladder(_df, _product_stats, _hier)
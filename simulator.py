@@ -0,0 +1,159 @@
+"""What-if simulator: resale value paths of a portfolio across Kondisi transitions.
+
+Each unit is bought in ``Kondisi_Beli`` (default New) in the start month and sold in
+``Kondisi_Jual`` (default Second) after the holding period. Prices come from the
+cached per-product trend coefficients (``build_product_stats``), with the price
+ladder and the hierarchical pooled model for combinations that have no trend of their own. They
+are evaluated once per distinct product × Kondisi × month and then gathered for
+every unit, so the cost hardly grows with the number of units. Each Kondisi is
+extrapolated on its own line, so the table is capped to New ≥ Second ≥ BC (the
+ordering ``data_loader.screen_prices`` enforces on the data) before the gathers.
+"""
+
+import numpy as np
+import pandas as pd
+
+from data_loader import VARIANT_MAP
+from models import predict_batch
+
+SIM_KONDISI = ["New", "Second", "BC"]
+PORTFOLIO_COLUMNS = ["Generasi", "Variant", "Storage"]
+PORTFOLIO_DEFAULTS = {"Jumlah": 1, "Kondisi_Beli": "New", "Kondisi_Jual": "Second"}
+
+
+def _canonical(values, names):
+    """Strip ``values`` and map them case-insensitively onto ``names`` (others kept as typed)."""
+    values = values.astype(str).str.strip()
+    lookup = {str(n).lower(): n for n in names}
+    return values.str.lower().map(lookup).fillna(values)
+
+
+def read_portfolio(portfolio, generasi=None, variants=None):
+    """Validate and normalize a portfolio (CSV path/buffer or DataFrame).
+
+    Required columns: Generasi, Variant, Storage. Optional: Jumlah, Kondisi_Beli,
+    Kondisi_Jual, Harga_Beli (defaults to the projected price in Kondisi_Beli);
+    any other column is passed through. Text is stripped and matched without regard
+    to case; with ``generasi``/``variants`` (the names the models know) any other
+    name is rejected. Raises ``ValueError`` on invalid rows.
+    """
+    units = portfolio.copy(deep=False) if isinstance(portfolio, pd.DataFrame) else pd.read_csv(portfolio)
+    missing = [c for c in PORTFOLIO_COLUMNS if c not in units.columns]
+    if missing:
+        raise ValueError(f"Kolom wajib tidak ada: {', '.join(missing)}")
+    for col, default in PORTFOLIO_DEFAULTS.items():
+        units[col] = units[col].fillna(default) if col in units.columns else default
+
+    units["Generasi"] = _canonical(units["Generasi"], generasi if generasi is not None else [])
+    variant_names = [*VARIANT_MAP, *(variants if variants is not None else [])]
+    units["Variant_Normalized"] = _canonical(units["Variant"], variant_names).replace(VARIANT_MAP)
+    for col in ["Kondisi_Beli", "Kondisi_Jual"]:
+        units[col] = _canonical(units[col], SIM_KONDISI)
+    units["Storage"] = pd.to_numeric(units["Storage"], errors="coerce").replace(1000, 1024)
+    units["Jumlah"] = pd.to_numeric(units["Jumlah"], errors="coerce")
+    if "Harga_Beli" in units.columns:
+        units["Harga_Beli"] = pd.to_numeric(units["Harga_Beli"], errors="coerce")
+
+    invalid = (
+        ~(units["Storage"] > 0) | ~(units["Jumlah"] > 0) |
+        ~units["Kondisi_Beli"].isin(SIM_KONDISI) | ~units["Kondisi_Jual"].isin(SIM_KONDISI)
+    )
+    if invalid.any():
+        rows = ", ".join(str(i + 2) for i in np.flatnonzero(invalid.to_numpy())[:5])
+        raise ValueError(f"{int(invalid.sum())} baris tidak valid (baris CSV {rows}…): "
+                         f"cek Storage > 0, Jumlah > 0, dan Kondisi ∈ {SIM_KONDISI}")
+    unknown = pd.Series(False, index=units.index)
+    if generasi is not None:
+        unknown |= ~units["Generasi"].isin(generasi)
+    if variants is not None:
+        unknown |= ~units["Variant_Normalized"].isin(variants)
+    if unknown.any():
+        rows = ", ".join(str(i + 2) for i in np.flatnonzero(unknown.to_numpy())[:5])
+        names = ", ".join(sorted(set(units.loc[unknown, "Generasi"] + " " + units.loc[unknown, "Variant_Normalized"]))[:5])
+        raise ValueError(f"{int(unknown.sum())} baris dengan Generasi/Variant yang tidak dikenal "
+                         f"(baris CSV {rows}…): {names}")
+    units["Storage"] = units["Storage"].astype(int)
+    return units
+
+
+def simulate_portfolio(portfolio, product_stats, hier, start_date, months, min_date, level=0.9, ladder=None):
+    """Project every unit over ``months`` months from ``start_date``.
+
+    Returns a dict with:
+
+    * ``units`` — the portfolio plus Harga_Beli, Nilai_Jual (with Lower/Upper at
+      ``level``), Nilai_New/Second/BC at the end, Depresiasi (Rp, %), and the Metode
+      behind Nilai_Jual (see ``predict_batch``), per unit.
+    * ``paths`` — array (units, months + 1) of the value in Kondisi_Jual per month.
+    * ``portfolio_path`` — total value per month (× Jumlah) if every unit were sold
+      as New, Second, or BC, and in its own Kondisi_Jual (``Portofolio``).
+    * ``dates`` — the simulated months.
+    """
+    units = read_portfolio(portfolio, hier["index"][1].unique(level="Generasi"),
+                           hier["index"][2].unique(level="Variant_Normalized"))
+    dates = pd.date_range(start_date, periods=months + 1, freq="MS")
+    bulan_index = np.round((dates - min_date).days / 30).to_numpy()
+
+    gvs = ["Generasi", "Variant_Normalized", "Storage"]
+    keys = units["Generasi"] + "|" + units["Variant_Normalized"] + "|" + units["Storage"].astype(str)
+    codes, uniques = pd.factorize(keys)
+    # factorize numbers keys by first appearance, so the non-duplicates line up with the codes
+    products = units.loc[~keys.duplicated(), gvs].reset_index(drop=True)
+
+    n_k, n_p, n_m = len(SIM_KONDISI), len(uniques), len(dates)
+    query = products.iloc[np.tile(np.repeat(np.arange(n_p), n_m), n_k)].reset_index(drop=True)
+    query.insert(0, "Kondisi", np.repeat(SIM_KONDISI, n_p * n_m))
+    t = np.tile(bulan_index, n_k * n_p)
+    pred = predict_batch(product_stats, hier, query, t, level, ladder=ladder)
+    table = pred[["Predicted", "Lower", "Upper"]].to_numpy(dtype=float).reshape(n_k, n_p, n_m, 3)
+    method = pred["Metode"].to_numpy().reshape(n_k, n_p, n_m)
+    # SIM_KONDISI runs New → BC: a lower Kondisi is never worth more than the one above
+    table = np.minimum.accumulate(table, axis=0)
+
+    k_code = {k: i for i, k in enumerate(SIM_KONDISI)}
+    k_buy = units["Kondisi_Beli"].map(k_code).to_numpy()
+    k_sell = units["Kondisi_Jual"].map(k_code).to_numpy()
+    qty = units["Jumlah"].to_numpy(dtype=float)
+
+    buy = table[k_buy, codes, 0, 0]
+    if "Harga_Beli" in units.columns:
+        buy = units["Harga_Beli"].fillna(pd.Series(buy, index=units.index)).to_numpy()
+    end = table[k_sell, codes, -1]
+    units["Harga_Beli"] = buy
+    units["Nilai_Jual"] = end[:, 0]
+    units["Nilai_Jual_Bawah"] = end[:, 1]
+    units["Nilai_Jual_Atas"] = end[:, 2]
+    for i, k in enumerate(SIM_KONDISI):
+        units[f"Nilai_{k}"] = table[i, codes, -1, 0]
+    units["Depresiasi"] = buy - end[:, 0]
+    units["Depresiasi_Pct"] = units["Depresiasi"] / buy * 100
+    units["Metode"] = method[k_sell, codes, -1]
+
+    # Totals per month: quantities summed per (Kondisi, product) first, then one contraction
+    weight = np.zeros((n_k, n_p))
+    np.add.at(weight, (k_sell, codes), qty)
+    per_product = np.bincount(codes, weights=qty, minlength=n_p)
+    values = table[..., 0]
+    portfolio_path = pd.DataFrame(np.einsum("kpm,p->km", values, per_product), index=SIM_KONDISI, columns=dates).T
+    portfolio_path["Portofolio"] = np.einsum("kpm,kp->m", values, weight)
+
+    return {
+        "units": units.drop(columns="Variant_Normalized"),
+        "paths": table[k_sell, codes, :, 0],
+        "portfolio_path": portfolio_path,
+        "dates": dates,
+    }
+
+
+def sample_portfolio(df, n_units, seed=42):
+    """Random portfolio drawn from products in the dataset (for demos and timing)."""
+    rng = np.random.default_rng(seed)
+    products = df[["Generasi", "Variant_Normalized", "Storage"]].drop_duplicates().to_numpy()
+    pick = products[rng.integers(len(products), size=n_units)]
+    return pd.DataFrame({
+        "Unit_ID": np.arange(1, n_units + 1),
+        "Generasi": pick[:, 0], "Variant": pick[:, 1], "Storage": pick[:, 2].astype(int),
+        "Jumlah": 1,
+        "Kondisi_Beli": "New",
+        "Kondisi_Jual": rng.choice(["Second", "BC"], size=n_units, p=[0.7, 0.3]),
+    })
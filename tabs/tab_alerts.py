@@ -0,0 +1,61 @@
+"""Tab Alerts — ranked price-change alerts over every product and month."""
+
+import streamlit as st
+import pandas as pd
+
+from alerts import scan_alerts, ALERT_Z_TREN, ALERT_Z_KOHORT, ALERT_MOM_PCT
+
+
+def render(df, product_stats):
+    st.subheader("🚨 Alert Perubahan Harga")
+    st.caption(
+        "Semua produk dipindai tiap bulan: selisih terhadap tren produk sendiri (Z Tren), perubahan bulanan "
+        "dibanding produk lain di Generasi/Variant yang sama (Z Kohort), dan perubahan bulanan (MoM). "
+        "Skor = sinyal terkuat dibagi ambangnya; ≥ 1 berarti alert."
+    )
+
+    tcol1, tcol2, tcol3 = st.columns(3)
+    with tcol1:
+        z_tren = st.slider("Ambang Z Tren", 1.0, 5.0, ALERT_Z_TREN, 0.1, key="al_ztren")
+    with tcol2:
+        z_kohort = st.slider("Ambang Z Kohort", 1.0, 5.0, ALERT_Z_KOHORT, 0.1, key="al_zkohort")
+    with tcol3:
+        mom_pct = st.slider("Ambang MoM (%)", 1.0, 30.0, ALERT_MOM_PCT, 0.5, key="al_mom")
+
+    alerts = scan_alerts(df, product_stats, z_tren, z_kohort, mom_pct)
+
+    months = sorted(df["Bulan"].unique(), reverse=True)
+    fcol1, fcol2, fcol3 = st.columns(3)
+    with fcol1:
+        bulan = st.selectbox("Bulan", ["Semua"] + [pd.Timestamp(m).strftime("%b %Y") for m in months], key="al_bulan")
+    with fcol2:
+        kondisi = st.selectbox("Kondisi", ["Semua"] + sorted(df["Kondisi"].unique()), key="al_kondisi")
+    with fcol3:
+        arah = st.selectbox("Arah", ["Semua", "📉 Turun", "📈 Naik"], key="al_arah")
+
+    view = alerts
+    if bulan != "Semua":
+        view = view[view["Bulan"].dt.strftime("%b %Y") == bulan]
+    if kondisi != "Semua":
+        view = view[view["Kondisi"] == kondisi]
+    if arah != "Semua":
+        view = view[view["Arah"] == arah]
+
+    mcol1, mcol2, mcol3 = st.columns(3)
+    mcol1.metric("Alert", f"{len(view):,}")
+    mcol2.metric("📉 Turun", f"{(view['Arah'] == '📉 Turun').sum():,}")
+    mcol3.metric("📈 Naik", f"{(view['Arah'] == '📈 Naik').sum():,}")
+
+    if view.empty:
+        st.info("Tidak ada alert dengan ambang dan filter yang dipilih.")
+        return
+
+    st.dataframe(
+        view.drop(columns="Product_Key").style.format({
+            "Bulan": lambda b: b.strftime("%b %Y"), "Harga": "Rp {:,.0f}", "Harga_Tren": "Rp {:,.0f}",
+            "Z_Tren": "{:+.2f}", "Z_Kohort": "{:+.2f}", "MoM (%)": "{:+.1f}%", "Skor": "{:.2f}",
+        }, na_rep="—"),
+        use_container_width=True, hide_index=True, height=450,
+    )
+    st.download_button("⬇️ Download Alert (.csv)", lambda: view.to_csv(index=False), file_name="alert_harga.csv",
+                       mime="text/csv")
@@ -1,10 +1,11 @@
 """Tab Analisis Data — box plots and scatter charts."""
 
 import streamlit as st
-import plotly.express as px
 
 
 def render(df):
+    import plotly.express as px
+
     st.subheader("Analisis Data")
 
     col_x, col_y = st.columns(2)
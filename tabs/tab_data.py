@@ -3,7 +3,7 @@
 import streamlit as st
 
 
-def render(df):
+def render(df, quarantine=None):
     st.subheader("Dataset Lengkap")
 
     fcol1, fcol2, fcol3, fcol4 = st.columns(4)
@@ -16,7 +16,7 @@ def render(df):
     with fcol4:
         f_stor = st.multiselect("Storage", sorted(df["Storage"].unique()), key="f_stor")
 
-    display_df = df.copy()
+    display_df = df
     if f_kondisi:
         display_df = display_df[display_df["Kondisi"].isin(f_kondisi)]
     if f_gen:
@@ -37,3 +37,17 @@ def render(df):
         use_container_width=True, hide_index=True, height=500,
     )
     st.caption(f"Menampilkan {len(display_df)} dari {len(df)} data")
+
+    st.subheader("🚧 Data Karantina")
+    st.caption(
+        "Baris yang ditolak saat load: tidak valid, lonjakan harga vs median bulan-bulan tetangga (MAD), "
+        "atau melanggar urutan New ≥ Second ≥ BC. Baris ini tidak dipakai model."
+    )
+    if quarantine is None or quarantine.empty:
+        st.success("Tidak ada baris yang dikarantina.")
+    else:
+        q_cols = ["Bulan", "Kondisi", "Generasi", "Variant", "Storage", "Harga", "Alasan", "Harga_Referensi"]
+        st.dataframe(quarantine[[c for c in q_cols if c in quarantine.columns]],
+                     use_container_width=True, hide_index=True)
+        st.download_button("⬇️ Download Laporan Karantina (.csv)", quarantine.to_csv(index=False),
+                           file_name="karantina.csv")
@@ -1,12 +1,18 @@
 """Tab Evaluasi Model — per-product scatter + global model comparison."""
 
+import io
+
 import streamlit as st
 import pandas as pd
-import plotly.express as px
 import plotly.graph_objects as go
 
+from compact import xgboost_raw
+
+
+def render(eval_df, global_results, hier_benchmark=None, best_name=None, compact=None, compact_report=None,
+           search_result=None, trend_modes_eval=None):
+    import plotly.express as px
 
-def render(eval_df, global_results):
     st.subheader("Evaluasi Model Per-Produk vs Global")
     st.markdown("""
     **Per-Produk (Linear Trend):** Setiap kombinasi Kondisi+Generasi+Variant+Storage punya model sendiri.
@@ -38,6 +44,39 @@ def render(eval_df, global_results):
         ))
         st.plotly_chart(fig_pp, use_container_width=True)
 
+    if hier_benchmark:
+        st.subheader("Hierarchical Pooled vs Per-Produk (Leave-Last-Out)")
+        st.caption(
+            "Hierarchical pooled: slope log-harga dibagi bertingkat Kondisi → Generasi → Variant → Storage "
+            "(empirical Bayes, closed form). Juga melayani kombinasi yang tidak ada di dataset tanpa model global."
+        )
+        bench_df = pd.DataFrame([
+            {
+                "Metode": name,
+                "MAPE (%)": f"{res['mape']:.2f}",
+                "MAE (Rp)": f"{res['mae']:,.0f}",
+                "Waktu Fit (ms)": f"{res['fit_seconds'] * 1000:.1f}",
+                "Produk Dievaluasi": res["n_eval"],
+            }
+            for name, res in hier_benchmark.items()
+        ])
+        st.dataframe(bench_df, use_container_width=True, hide_index=True)
+
+    if trend_modes_eval is not None and not trend_modes_eval.empty:
+        st.subheader("Mode Trend Per-Produk: OLS vs Robust vs Change-Point (Leave-Last-Out)")
+        st.caption(
+            "Theil–Sen: median slope antar semua pasangan titik. Huber IRLS: bobot turun untuk residual besar. "
+            "Change-Point: segmen piecewise-linear dengan lonjakan level/slope di bulan rilis generasi baru, "
+            "dipakai hanya bila signifikan (uji F); + Musiman: faktor per bulan (Bulan_Num) gabungan semua produk. "
+            "Semua produk dihitung sekaligus pada array per-produk yang di-padding."
+        )
+        modes_fmt = trend_modes_eval.assign(
+            **{"MAPE (%)": trend_modes_eval["MAPE (%)"].map("{:.2f}".format),
+               "MAE (Rp)": trend_modes_eval["MAE (Rp)"].map("{:,.0f}".format),
+               "Waktu Fit (ms)": trend_modes_eval["Waktu Fit (ms)"].map("{:.2f}".format)}
+        )
+        st.dataframe(modes_fmt, use_container_width=True, hide_index=True)
+
     st.subheader("Perbandingan Model Global (Fallback)")
     comparison_data = []
     for name, res in global_results.items():
@@ -64,3 +103,56 @@ def render(eval_df, global_results):
                           color="Model", text="MAPE (%)")
         fig_mape.update_traces(textposition="outside")
         st.plotly_chart(fig_mape, use_container_width=True)
+
+    if search_result:
+        chosen = search_result["chosen"]
+        st.subheader("Log Pencarian Hyperparameter (Hyperband)")
+        st.caption(
+            f"Validasi temporal (bulan terakhir) dengan early stopping XGBoost — "
+            f"{len(search_result['log'])} trial dalam {search_result['elapsed']:.1f} detik. "
+            f"Dipilih model termurah (trees × depth) dengan MAPE ≤ "
+            f"{search_result['best_mape'] * (1 + search_result['tolerance']):.2f}%."
+        )
+        s_col1, s_col2, s_col3 = st.columns(3)
+        with s_col1:
+            st.metric("Model Terpilih", chosen["Model"])
+        with s_col2:
+            st.metric("Trees Dipakai", f"{int(chosen['n_used'])}")
+        with s_col3:
+            st.metric("MAPE Validasi", f"{chosen['MAPE (%)']:.2f}%")
+        st.dataframe(
+            search_result["log"].sort_values(["Bracket", "Rung", "MAPE (%)"], ascending=[False, True, True]),
+            use_container_width=True, hide_index=True, height=300,
+        )
+
+    if compact_report:
+        st.subheader(f"Model Ringkas (Compact) — {best_name}")
+        st.caption(
+            "Ensemble terbaik dikompilasi ke array node datar (feature, threshold, left, right, value) "
+            "dan diprediksi dengan traversal NumPy. Paritas dicek pada data uji (y_test)."
+        )
+        r = compact_report
+        cmp_df = pd.DataFrame([
+            {"Format": "Asli (sklearn/XGBoost)", "MAPE (%)": f"{r['mape_orig']:.4f}",
+             "Ukuran Pickle (KB)": f"{r['bytes_orig'] / 1024:,.0f}",
+             "Load (ms)": f"{r['load_orig'] * 1000:.2f}", "Latensi 1 Baris (µs)": f"{r['latency_orig'] * 1e6:,.0f}"},
+            {"Format": "Compact (NumPy)", "MAPE (%)": f"{r['mape_compact']:.4f}",
+             "Ukuran Pickle (KB)": f"{r['bytes_compact'] / 1024:,.0f}",
+             "Load (ms)": f"{r['load_compact'] * 1000:.2f}", "Latensi 1 Baris (µs)": f"{r['latency_compact'] * 1e6:,.0f}"},
+        ])
+        st.dataframe(cmp_df, use_container_width=True, hide_index=True)
+        if r["parity_ok"]:
+            st.success(f"✅ Paritas OK — selisih maks Rp {r['max_abs_diff']:,.6f} ({r['n_nodes']:,} node)")
+        else:
+            st.warning(f"⚠️ Paritas gagal (selisih maks Rp {r['max_abs_diff']:,.2f}) — aplikasi tetap memakai model asli")
+
+        buf = io.BytesIO()
+        compact.save(buf)
+        dl_col1, dl_col2 = st.columns(2)
+        with dl_col1:
+            st.download_button("⬇️ Download Compact (.npz)", buf.getvalue(), file_name="global_compact.npz")
+        with dl_col2:
+            # Tuned XGBoost too ("XGBoost (Tuned)"), so check the model rather than its name
+            if hasattr(global_results[best_name]["model"], "get_booster"):
+                st.download_button("⬇️ Download XGBoost (.ubj)", xgboost_raw(global_results[best_name]["model"]),
+                                   file_name="global_xgboost.ubj")
@@ -2,7 +2,6 @@
 
 import streamlit as st
 import pandas as pd
-import plotly.express as px
 
 V_ORDER = ["Mini", "e", "Basic", "Air", "Plus", "Pro", "Pro Max"]
 
@@ -12,6 +11,8 @@ def _sort_gen(index):
 
 
 def render(df, kondisi_options):
+    import plotly.express as px
+
     st.subheader("🗺️ Heatmap Harga iPhone")
     st.caption("Visualisasi harga dalam bentuk heatmap dengan filter lengkap")
 
@@ -29,7 +30,7 @@ def render(df, kondisi_options):
         hm_storage = st.selectbox("Storage (GB)", hm_storage_options, key="hm_storage")
 
     # Filter data
-    hm_df = df[(df["Kondisi"] == hm_kondisi) & (df["Bulan"] == hm_bulan)].copy()
+    hm_df = df[(df["Kondisi"] == hm_kondisi) & (df["Bulan"] == hm_bulan)]
     if hm_storage != "Semua":
         hm_df = hm_df[hm_df["Storage"] == int(hm_storage)]
 
@@ -92,7 +93,7 @@ def render(df, kondisi_options):
     # ── Heatmap 4: Perbandingan antar Kondisi ──
     st.subheader("Perbandingan Harga antar Kondisi")
     st.caption("Heatmap rata-rata harga per Kondisi × Generasi (semua variant & storage)")
-    hm_df4 = df[df["Bulan"] == hm_bulan].copy()
+    hm_df4 = df[df["Bulan"] == hm_bulan]
     if hm_storage != "Semua":
         hm_df4 = hm_df4[hm_df4["Storage"] == int(hm_storage)]
     if not hm_df4.empty:
@@ -120,8 +121,8 @@ def render(df, kondisi_options):
 
     prev_bulan = bulan_options[bulan_idx - 1]
     prev_label = bulan_labels[bulan_idx - 1]
-    cur = df[(df["Kondisi"] == hm_kondisi) & (df["Bulan"] == hm_bulan)].copy()
-    prev = df[(df["Kondisi"] == hm_kondisi) & (df["Bulan"] == prev_bulan)].copy()
+    cur = df[(df["Kondisi"] == hm_kondisi) & (df["Bulan"] == hm_bulan)]
+    prev = df[(df["Kondisi"] == hm_kondisi) & (df["Bulan"] == prev_bulan)]
     if hm_storage != "Semua":
         cur = cur[cur["Storage"] == int(hm_storage)]
         prev = prev[prev["Storage"] == int(hm_storage)]
@@ -0,0 +1,100 @@
+"""Tab Simulasi — what-if resale value of a portfolio across Kondisi transitions."""
+
+import time
+
+import streamlit as st
+import pandas as pd
+import plotly.graph_objects as go
+
+from simulator import simulate_portfolio, sample_portfolio, SIM_KONDISI
+
+
+def render(df, product_stats, hier_model, level=0.9, ladder=None):
+    st.subheader("🔮 Simulasi Depresiasi Portofolio")
+    st.caption(
+        "Berapa nilai jual unit yang dibeli hari ini setelah N bulan, bila dijual sebagai New/Second/BC? "
+        "Semua unit disimulasikan sekaligus dari koefisien tren per-produk (price ladder/hierarchical untuk kombinasi tanpa data)."
+    )
+
+    ucol1, ucol2 = st.columns([2, 1])
+    with ucol1:
+        uploaded = st.file_uploader(
+            "Upload portofolio (.csv) — kolom wajib: Generasi, Variant, Storage; "
+            "opsional: Jumlah, Kondisi_Beli, Kondisi_Jual, Harga_Beli",
+            type="csv", key="sim_upload",
+        )
+    with ucol2:
+        st.download_button(
+            "⬇️ Template Portofolio (.csv)", sample_portfolio(df, 5).to_csv(index=False),
+            file_name="template_portofolio.csv",
+        )
+        n_sample = st.number_input("Contoh acak (unit)", min_value=10, max_value=200_000, value=1_000, step=1_000,
+                                   key="sim_n", help="Dipakai bila belum ada file yang diupload")
+
+    last_month = df["Bulan"].max()
+    scol1, scol2, scol3 = st.columns(3)
+    with scol1:
+        bulan_beli = st.slider("Bulan Beli", 1, 12, int(last_month.month), key="sim_bulan")
+    with scol2:
+        tahun_beli = st.number_input("Tahun Beli", min_value=2025, max_value=2030, value=int(last_month.year),
+                                     key="sim_tahun")
+    with scol3:
+        hold = st.slider("Lama Tahan (bulan)", 1, 36, 12, key="sim_hold")
+
+    portfolio = uploaded if uploaded is not None else sample_portfolio(df, int(n_sample))
+    start = time.perf_counter()
+    try:
+        sim = simulate_portfolio(
+            portfolio, product_stats, hier_model, pd.Timestamp(year=tahun_beli, month=bulan_beli, day=1),
+            hold, df["Bulan"].min(), level, ladder,
+        )
+    except ValueError as e:
+        st.error(f"❌ Portofolio tidak bisa diproses: {e}")
+        return
+    elapsed = time.perf_counter() - start
+    units, path = sim["units"], sim["portfolio_path"]
+
+    qty = units["Jumlah"]
+    total_buy = (units["Harga_Beli"] * qty).sum()
+    total_sell = (units["Nilai_Jual"] * qty).sum()
+    mcol1, mcol2, mcol3, mcol4 = st.columns(4)
+    mcol1.metric("Unit", f"{int(qty.sum()):,}")
+    mcol2.metric("Total Harga Beli", f"Rp {total_buy:,.0f}")
+    mcol3.metric(f"Nilai Jual (+{hold} bln)", f"Rp {total_sell:,.0f}")
+    mcol4.metric("Depresiasi", f"Rp {total_buy - total_sell:,.0f}",
+                 delta=f"{-(total_buy - total_sell) / total_buy * 100:.1f}%")
+    st.caption(f"⏱️ {len(units):,} baris disimulasikan dalam {elapsed * 1000:.0f} ms")
+
+    fig = go.Figure()
+    for col, dash in zip(SIM_KONDISI, ["dot", "dash", "dashdot"]):
+        fig.add_trace(go.Scatter(x=path.index, y=path[col], mode="lines", name=f"Semua dijual {col}",
+                                 line=dict(dash=dash, width=1.5)))
+    fig.add_trace(go.Scatter(x=path.index, y=path["Portofolio"], mode="lines+markers",
+                             name="Portofolio (Kondisi_Jual)", line=dict(color="#AB63FA", width=3)))
+    fig.update_layout(title="Nilai Portofolio per Bulan", xaxis_title="Bulan", yaxis_title="Total Nilai (Rp)",
+                      hovermode="x unified", height=400)
+    st.plotly_chart(fig, use_container_width=True)
+
+    by_transition = units.assign(
+        Beli=units["Harga_Beli"] * qty, Jual=units["Nilai_Jual"] * qty,
+    ).groupby(["Kondisi_Beli", "Kondisi_Jual"])[["Jumlah", "Beli", "Jual"]].sum()
+    by_transition["Depresiasi (%)"] = (1 - by_transition["Jual"] / by_transition["Beli"]) * 100
+    st.dataframe(by_transition.reset_index().style.format({
+        "Beli": "Rp {:,.0f}", "Jual": "Rp {:,.0f}", "Depresiasi (%)": "{:.1f}%",
+    }), use_container_width=True, hide_index=True)
+
+    st.dataframe(units.head(1_000), use_container_width=True, hide_index=True, height=300)
+    if len(units) > 1_000:
+        st.caption(f"Menampilkan 1.000 dari {len(units):,} unit — unduh CSV untuk semuanya")
+
+    with_paths = st.checkbox("Sertakan nilai per bulan di CSV", value=False, key="sim_paths")
+
+    def to_csv():
+        out = units
+        if with_paths:
+            monthly = pd.DataFrame(sim["paths"], columns=[f"Nilai_{d:%Y-%m}" for d in sim["dates"]], index=units.index)
+            out = pd.concat([units, monthly], axis=1)
+        return out.to_csv(index=False)
+
+    st.download_button("⬇️ Download Hasil Simulasi (.csv)", to_csv, file_name="simulasi_portofolio.csv",
+                       mime="text/csv")
@@ -2,10 +2,13 @@
 
 import streamlit as st
 import pandas as pd
-import plotly.express as px
 
+from alerts import trend_label
+
+
+def render(df, kondisi, generasi, variant, kondisi_options, product_models, product_stats=None):
+    import plotly.express as px
 
-def render(df, kondisi, generasi, variant, kondisi_options, product_models):
     st.subheader("Tren Harga per Bulan")
 
     tcol1, tcol2, tcol3 = st.columns(3)
@@ -16,7 +19,7 @@ def render(df, kondisi, generasi, variant, kondisi_options, product_models):
     with tcol3:
         trend_variant = st.multiselect("Filter Variant", sorted(df["Variant_Normalized"].unique()), default=[variant])
 
-    trend_df = df.copy()
+    trend_df = df
     if trend_kondisi:
         trend_df = trend_df[trend_df["Kondisi"].isin(trend_kondisi)]
     if trend_gen:
@@ -25,10 +28,10 @@ def render(df, kondisi, generasi, variant, kondisi_options, product_models):
         trend_df = trend_df[trend_df["Variant_Normalized"].isin(trend_variant)]
 
     if not trend_df.empty:
-        trend_df["Label"] = (
+        trend_df = trend_df.assign(Label=(
             trend_df["Kondisi"] + " | " + trend_df["Generasi"] + " " +
             trend_df["Variant_Normalized"] + " " + trend_df["Storage"].astype(str) + "GB"
-        )
+        ))
         trend_agg = trend_df.groupby(["Bulan", "Label"])["Harga"].mean().reset_index()
         fig_trend = px.line(
             trend_agg, x="Bulan", y="Harga", color="Label",
@@ -44,16 +47,15 @@ def render(df, kondisi, generasi, variant, kondisi_options, product_models):
     trend_summary = []
     for pk, pm_data in product_models.items():
         if pm_data["n_points"] >= 2:
+            slope = product_stats.at[pk, "slope"] if product_stats is not None else pm_data["slope"]
             parts = pk.split("|")
             trend_summary.append({
                 "Kondisi": parts[0], "Generasi": parts[1], "Variant": parts[2],
                 "Storage": int(parts[3]), "Data": pm_data["n_points"],
                 "Harga Awal": f"Rp {pm_data['first_price']:,.0f}",
                 "Harga Akhir": f"Rp {pm_data['last_price']:,.0f}",
-                "Δ/Bulan": f"Rp {pm_data['slope']:,.0f}",
-                "Tren": "📉 Turun" if pm_data["slope"] < -50000 else (
-                    "📈 Naik" if pm_data["slope"] > 50000 else "➡️ Stabil"
-                ),
+                "Δ/Bulan": f"Rp {slope:,.0f}",
+                "Tren": trend_label(slope),
             })
 
     if trend_summary:
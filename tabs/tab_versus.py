@@ -2,8 +2,8 @@
 
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
+
+from alerts import trend_label
 
 
 def _product_label(kondisi, generasi, variant, storage):
@@ -11,6 +11,8 @@ def _product_label(kondisi, generasi, variant, storage):
 
 
 def render(df):
+    import plotly.express as px
+
     st.subheader("⚔️ Versus — Perbandingan Harga Dinamis")
     st.caption("Bandingkan tren harga aktual antar produk (bukan prediksi). Tambahkan sebanyak mungkin produk untuk dibandingkan.")
 
@@ -71,7 +73,7 @@ def render(df):
             (df["Variant_Normalized"] == sel["Variant"]) &
             (df["Storage"] == sel["Storage"])
         )
-        prod_df = df[mask][["Bulan", "Harga"]].copy()
+        prod_df = df[mask][["Bulan", "Harga"]]
         prod_df["Produk"] = label
         all_data.append(prod_df)
         labels.append(label)
@@ -99,7 +101,7 @@ def render(df):
     # ── 2. Bar Chart: Harga Terbaru ──
     st.subheader("📊 Harga Terbaru (Bulan Terakhir)")
     latest_bulan = compare_df["Bulan"].max()
-    latest_df = compare_df[compare_df["Bulan"] == latest_bulan].copy()
+    latest_df = compare_df[compare_df["Bulan"] == latest_bulan]
 
     if not latest_df.empty:
         latest_df = latest_df.sort_values("Harga", ascending=True)
@@ -183,9 +185,7 @@ def render(df):
             total_change = prices_list[-1] - prices_list[0]
             row["Total Δ"] = f"Rp {total_change:,.0f}"
             row["Δ %"] = f"{total_change / prices_list[0] * 100:.1f}%"
-            row["Tren"] = "📉 Turun" if total_change < -50000 else (
-                "📈 Naik" if total_change > 50000 else "➡️ Stabil"
-            )
+            row["Tren"] = trend_label(total_change)
         else:
             row["Total Δ"] = "—"
             row["Δ %"] = "—"